@@ -5,126 +5,250 @@ Enrich recommendations.json with data scraped from each episode's Substack artic
 1. Direct URLs for recommended books, products, and TV/movies (matched via fuzzy name match)
 2. "Where to find" links for each guest — scraped from the "Where to find {Name}:" section
 
+Pages are fetched concurrently over pooled keep-alive connections, with requests to
+each host spaced out and transient failures retried; each page is parsed chunk by
+chunk while it downloads, and written to the cache the same way. Pages are cached in
+.http_cache/ and revalidated on later runs, so --force mostly costs 304s; --offline
+replays the cache without touching the network.
+
 Resumable: episodes already enriched with where_to_find are skipped unless --force is passed.
-Run: python3 add_item_urls.py
+
+Stage timings (read, fetch, HTML parse, fuzzy match, save) and HTTP counters are
+written to .metrics/ after each run (see metrics.py); --profile adds a cProfile.
+
+Run: python3 add_item_urls.py [--concurrency 4] [--force] [--offline] [--profile]
 """
 
+import argparse
+import codecs
 import json
 import re
-import sys
 import time
-import urllib.request
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from difflib import SequenceMatcher
+from html.parser import HTMLParser
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Dict, Tuple
+
+import metrics
+from http_cache import FetchError, HostLimiter, HttpCache, PageFetcher
 
 RECS_FILE = Path("recommendations.json")
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-}
-RATE_LIMIT_SECONDS = 0.5
+RATE_LIMIT_SECONDS = 0.5    # minimum spacing between requests to the same host
+CONCURRENCY = 4
 FUZZY_THRESHOLD = 0.65
-FORCE = '--force' in sys.argv
+NGRAM_SIZE = 2
+SHORT_QUERY_CHARS = 3   # names this short are scored against every link
 
 
-# ── Fetch ──────────────────────────────────────────────────────────────────────
-
-def fetch_page(url: str) -> str:
-    req = urllib.request.Request(url, headers=HEADERS)
-    try:
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            return resp.read().decode('utf-8', errors='replace')
-    except Exception as e:
-        print(f"    ⚠ fetch error: {e}")
-        return ""
+# ── Parse bullet links ─────────────────────────────────────────────────────────
 
+# Event kinds emitted by ArticleParser
+BULLET_LINK = 'bullet_link'        # <span>• Label: </span><a href=...>
+BOOK_LINK = 'book_link'            # <span>• </span><em>Title</em>...<a href=...>
+SECTION_START = 'section_start'    # <strong>Where to find {Name}:</strong>
+SECTION_END = 'section_end'        # the next <strong>, or the end of the page
+SECTION_LINK = 'section_link'      # a bullet link inside a "Where to find" section
 
-# ── Parse bullet links ─────────────────────────────────────────────────────────
+# Lenny's own section — never include these
+LENNY_MARKERS = {'lenny', 'lennyrachitsky', 'lennysnewsletter', 'rachitsky'}
 
-def extract_all_bullet_links(html: str) -> List[Dict]:
-    """
-    Extract ALL bullet-point `{name: label, url: href}` pairs from Substack HTML.
+BULLET_LABEL_RE = re.compile(r'[•·]\s*([^<\n]{2,100}?):\s*\Z')
+SECTION_LABEL_RE = re.compile(r'[•·]\s*([^<\n]{1,80}?):\s*\Z')
+BULLET_ONLY_RE = re.compile(r'[•·]\s*\Z')
+BOOK_TITLE_RE = re.compile(r'[^<]{2,100}')
+SECTION_HEADER_RE = re.compile(r'Where to find ([^<]{1,100}):', re.IGNORECASE)
+LINK_TAG_RE = re.compile(r'<a\s+href="(https?://[^"]+)"', re.IGNORECASE)
+TOKEN_WINDOW = 64
 
-    Two HTML patterns:
 
-    A) Plain label in span:
-       <p><span>• Notejoy: </span><a href="https://notejoy.com/" rel>...</a></p>
+class Event(NamedTuple):
+    kind: str
+    text: str = ''
+    url: str = ''
 
-    B) Italic title (books):
-       <p><span>• </span><em>Title</em><span>: </span><a href="https://amazon.com/..." rel>...</a></p>
-    """
-    links: List[Dict] = []
-    seen_urls: set = set()
 
-    def add(name: str, url: str) -> None:
-        url = url.strip()
-        if url not in seen_urls:
-            links.append({'name': name.strip(), 'url': url})
-            seen_urls.add(url)
+class ArticleParser(HTMLParser):
+    """Single-pass, incremental extractor for Substack article HTML.
 
-    # Pattern A
-    for m in re.finditer(
-        r'[•·]\s*([^<\n]{2,100}?):\s*</span>\s*<a\s+href="(https?://[^"]+)"',
-        html, re.IGNORECASE
-    ):
-        add(m.group(1), m.group(2))
+    Feed it the page as byte chunks in any split; it decodes incrementally and
+    turns the tag stream into Events, which pile up in .events:
 
-    # Pattern B (em-tagged book title)
-    for m in re.finditer(
-        r'[•·]\s*</span>\s*<em>([^<]{2,100})</em>(?:<span>[^<]*</span>)*\s*<a\s+href="(https?://[^"]+)"',
-        html, re.IGNORECASE
-    ):
-        add(m.group(1), m.group(2))
+      A) Plain label in span:
+         <p><span>• Notejoy: </span><a href="https://notejoy.com/" rel>...</a></p>
 
-    return links
+      B) Italic title (books):
+         <p><span>• </span><em>Title</em><span>: </span><a href="https://amazon.com/..." rel>...</a></p>
 
+      "Where to find {Name}:" sections run from their <strong> header to the next
+      <strong>; pattern A links inside one are also emitted as SECTION_LINK.
 
-def extract_where_to_find(html: str, guest_names: List[str]) -> List[Dict]:
+    Matching follows the tag sequences the old regexes accepted, looking back over a
+    short window of recent tokens whenever an <a> opens. Text is entity-decoded;
+    hrefs are taken verbatim from the tag.
     """
-    Find all "Where to find {Guest}:" sections in the HTML and extract their links.
-    Skips the "Where to find Lenny:" section.
 
-    Returns a list of {label, url} dicts, e.g.:
-      [{"label": "X", "url": "https://x.com/awilkinson"}, ...]
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.events: List[Event] = []
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._tokens: deque = deque(maxlen=TOKEN_WINDOW)   # ('data', text) | ('start', tag, raw) | ('end', tag)
+        self._text: List[str] = []
+        self._section: Optional[str] = None
+
+    def feed_bytes(self, chunk: bytes) -> None:
+        self.feed(self._decoder.decode(chunk))
+
+    def close(self) -> None:
+        self.feed(self._decoder.decode(b'', final=True))
+        super().close()
+        self._flush_text()
+        self._end_section()
+
+    # ── Tokenizer callbacks ──
+
+    def handle_data(self, data: str) -> None:
+        self._text.append(data)   # a text node may arrive in several pieces
+
+    def handle_starttag(self, tag: str, attrs) -> None:
+        self._flush_text()
+        raw = self.get_starttag_text() or ''
+        if tag == 'strong' and raw.lower() == '<strong>':
+            self._end_section()
+        elif tag == 'a':
+            m = LINK_TAG_RE.match(raw)
+            if m:
+                self._link(m.group(1))
+        self._tokens.append(('start', tag, raw.lower()))
+
+    def handle_startendtag(self, tag: str, attrs) -> None:
+        self._flush_text()
+        self._tokens.append(('start', tag, ''))
+
+    def handle_endtag(self, tag: str) -> None:
+        self._flush_text()
+        if tag == 'strong':
+            self._maybe_start_section()
+        self._tokens.append(('end', tag))
+
+    def handle_comment(self, data: str) -> None:
+        self._flush_text()
+        self._tokens.append(('comment',))
+
+    # ── Pattern matching ──
+
+    def _flush_text(self) -> None:
+        if self._text:
+            self._tokens.append(('data', ''.join(self._text)))
+            self._text = []
+
+    def _maybe_start_section(self) -> None:
+        tokens = self._tokens
+        if len(tokens) >= 2 and tokens[-1][0] == 'data' and tokens[-2] == ('start', 'strong', '<strong>'):
+            m = SECTION_HEADER_RE.fullmatch(tokens[-1][1])
+            if m:
+                self._section = m.group(1).strip()
+                self.events.append(Event(SECTION_START, self._section))
+
+    def _end_section(self) -> None:
+        if self._section is not None:
+            self.events.append(Event(SECTION_END, self._section))
+            self._section = None
+
+    def _link(self, url: str) -> None:
+        """An <a href="http..."> just opened: see which bullet pattern the preceding tokens form."""
+        tokens = list(self._tokens)
+        i = len(tokens) - 1
+        if i >= 0 and tokens[i][0] == 'data' and not tokens[i][1].strip():
+            i -= 1
+
+        # Pattern A: "• Label:" text, then </span>
+        if i >= 1 and tokens[i] == ('end', 'span') and tokens[i - 1][0] == 'data':
+            text = tokens[i - 1][1]
+            m = BULLET_LABEL_RE.search(text)
+            if m:
+                self.events.append(Event(BULLET_LINK, m.group(1).strip(), url))
+            if self._section is not None:
+                m = SECTION_LABEL_RE.search(text)
+                if m:
+                    self.events.append(Event(SECTION_LINK, m.group(1).strip(), url))
+
+        # Pattern B: "•" text, </span>, <em>Title</em>, any number of <span>...</span>
+        while i >= 2 and tokens[i] == ('end', 'span'):
+            j = i - 1
+            if tokens[j][0] == 'data':
+                j -= 1
+            if tokens[j] != ('start', 'span', '<span>'):
+                break
+            i = j - 1
+        if (i >= 4 and tokens[i] == ('end', 'em') and tokens[i - 1][0] == 'data'
+                and tokens[i - 2] == ('start', 'em', '<em>')):
+            title = tokens[i - 1][1]
+            j = i - 3
+            if tokens[j][0] == 'data' and not tokens[j][1].strip():
+                j -= 1
+            if (j >= 1 and tokens[j] == ('end', 'span') and tokens[j - 1][0] == 'data'
+                    and BULLET_ONLY_RE.search(tokens[j - 1][1]) and BOOK_TITLE_RE.fullmatch(title)):
+                self.events.append(Event(BOOK_LINK, title.strip(), url))
+
+
+def is_lenny(name: str) -> bool:
+    n = name.lower()
+    return any(m in n for m in LENNY_MARKERS)
+
+
+def extract_page(chunks: Iterable[bytes]) -> Tuple[List[Dict], List[Dict]]:
     """
-    # Lenny's own section — never include these
-    LENNY_MARKERS = {'lenny', 'lennyrachitsky', 'lennysnewsletter', 'rachitsky'}
-
-    def is_lenny(name: str) -> bool:
-        n = name.lower()
-        return any(m in n for m in LENNY_MARKERS)
-
-    results: List[Dict] = []
+    Parse a Substack article in one pass.
+
+    Returns (bullet_links, where_to_find):
+      bullet_links:  ALL bullet-point {name, url} pairs, plain labels before book titles
+      where_to_find: {label, url} pairs from the "Where to find {Guest}:" sections,
+                     skipping the "Where to find Lenny:" section, e.g.
+                     [{"label": "X", "url": "https://x.com/awilkinson"}, ...]
+    Both are de-duplicated by URL. Time spent parsing (not waiting for chunks) is
+    recorded as the "html_parse" stage.
+    """
+    parser = ArticleParser()
+    parse_time = 0.0
+    for chunk in chunks:
+        start = time.perf_counter()
+        parser.feed_bytes(chunk)
+        parse_time += time.perf_counter() - start
+    start = time.perf_counter()
+    parser.close()
+
+    plain: List[Dict] = []
+    books: List[Dict] = []
+    where: List[Dict] = []
+    where_urls: set = set()
+    section = None
+
+    for event in parser.events:
+        if event.kind == BULLET_LINK:
+            plain.append({'name': event.text, 'url': event.url.strip()})
+        elif event.kind == BOOK_LINK:
+            books.append({'name': event.text, 'url': event.url.strip()})
+        elif event.kind == SECTION_START:
+            section = event.text
+        elif event.kind == SECTION_END:
+            section = None
+        elif event.kind == SECTION_LINK and section is not None and not is_lenny(section):
+            url = event.url.strip()
+            if url not in where_urls:
+                where.append({'label': event.text, 'url': url})
+                where_urls.add(url)
+
+    bullet_links: List[Dict] = []
     seen_urls: set = set()
+    for link in plain + books:
+        if link['url'] not in seen_urls:
+            bullet_links.append(link)
+            seen_urls.add(link['url'])
 
-    # Find every "Where to find {Name}:" <strong> header
-    # Pattern: <strong>Where to find {Name}:</strong> ... bullet links ... next <strong>
-    section_pat = re.compile(
-        r'<strong>Where to find ([^<]{1,100}):</strong>(.*?)(?=<strong>|$)',
-        re.IGNORECASE | re.DOTALL
-    )
-
-    # Pattern A for within a section
-    link_pat_a = re.compile(
-        r'[•·]\s*([^<\n]{1,80}?):\s*</span>\s*<a\s+href="(https?://[^"]+)"',
-        re.IGNORECASE
-    )
-
-    for section_m in section_pat.finditer(html):
-        section_name = section_m.group(1).strip()
-        section_html = section_m.group(2)
-
-        if is_lenny(section_name):
-            continue  # skip Lenny's own section
-
-        for link_m in link_pat_a.finditer(section_html):
-            label = link_m.group(1).strip()
-            url = link_m.group(2).strip()
-            if url not in seen_urls:
-                results.append({'label': label, 'url': url})
-                seen_urls.add(url)
-
-    return results
+    metrics.record("html_parse", parse_time + time.perf_counter() - start)
+    return bullet_links, where
 
 
 # ── Item URL matching ──────────────────────────────────────────────────────────
@@ -134,26 +258,105 @@ def normalize(text: str) -> str:
     return re.sub(r'\s+', ' ', text).strip()
 
 
-def similarity(a: str, b: str) -> float:
-    return SequenceMatcher(None, normalize(a), normalize(b)).ratio()
+def ngrams(text: str, n: int = NGRAM_SIZE) -> set:
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
 
 
-def best_match_url(item_name: str, bullet_links: List[Dict]) -> Optional[str]:
-    best_score = 0.0
-    best_url = None
-    norm_item = normalize(item_name)
+class LinkIndex:
+    """Inverted index over link names for shortlisting fuzzy matches.
 
-    for link in bullet_links:
-        norm_link = normalize(link['name'])
-        if norm_item in norm_link or norm_link in norm_item:
-            if len(norm_item) >= 3 and len(norm_link) >= 3:
-                return link['url']
-        score = similarity(item_name, link['name'])
-        if score > best_score:
-            best_score = score
-            best_url = link['url']
+    Each name is normalized once and posted under its character bigrams, so a
+    lookup only scores links sharing a bigram with the item (short items are
+    scored against every link). The shortlist is complete for substring matches,
+    since a substring shares all its bigrams; fuzzy candidates are scored with
+    SequenceMatcher, reusing each link's precomputed matcher and skipping any
+    whose quick_ratio bound can't win. As with the old linear scan, a substring
+    match wins (earliest link first), otherwise the best ratio >= threshold,
+    ties going to the earliest link.
 
-    return best_url if best_score >= FUZZY_THRESHOLD else None
+    Links can be added incrementally, so one index can also back a catalog that
+    spans many episodes.
+    """
+
+    def __init__(self, threshold: float = FUZZY_THRESHOLD):
+        self.threshold = threshold
+        self.links: List[Dict] = []
+        self._names: List[str] = []
+        self._matchers: List[SequenceMatcher] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+
+    @classmethod
+    def from_links(cls, links: List[Dict], threshold: float = FUZZY_THRESHOLD) -> 'LinkIndex':
+        index = cls(threshold)
+        for link in links:
+            index.add(link)
+        return index
+
+    def add(self, link: Dict) -> None:
+        """Index a {name, url, ...} link; extra keys are passed through to matches."""
+        i = len(self.links)
+        norm = normalize(link['name'])
+        matcher = SequenceMatcher(None)
+        matcher.set_seq2(norm)
+        self.links.append(link)
+        self._names.append(norm)
+        self._matchers.append(matcher)
+        for gram in ngrams(norm):
+            self._postings[gram].append(i)
+
+    def match(self, item_name: str) -> Optional[Dict]:
+        """Return {url, name, score, reason} for the best link, or None.
+
+        reason is "exact", "contains" (the link name contains the item), "contained"
+        (the item contains the link name) or "fuzzy".
+        """
+        norm_item = normalize(item_name)
+        grams = ngrams(norm_item)
+        if len(norm_item) > SHORT_QUERY_CHARS:
+            shared: Dict[int, int] = defaultdict(int)
+            for gram in grams:
+                for i in self._postings.get(gram, ()):
+                    shared[i] += 1
+            candidates = sorted(shared, key=lambda i: (-shared[i], i))
+        else:
+            # Short names can match fuzzily without sharing an n-gram; just score every link
+            candidates = list(range(len(self.links)))
+
+        if len(norm_item) >= 3:
+            for i in sorted(candidates):
+                norm_link = self._names[i]
+                if len(norm_link) >= 3 and (norm_item in norm_link or norm_link in norm_item):
+                    reason = 'exact' if norm_item == norm_link else 'contains' if norm_item in norm_link else 'contained'
+                    return self._result(i, 1.0, reason)
+
+        best_score, best_i = 0.0, None
+        for i in candidates:
+            matcher = self._matchers[i]
+            matcher.set_seq1(norm_item)
+            if not self._can_beat(matcher.real_quick_ratio(), i, best_score, best_i):
+                continue
+            if not self._can_beat(matcher.quick_ratio(), i, best_score, best_i):
+                continue
+            score = matcher.ratio()
+            if self._can_beat(score, i, best_score, best_i):
+                best_score, best_i = score, i
+
+        if best_i is None or best_score < self.threshold:
+            return None
+        return self._result(best_i, best_score, 'fuzzy')
+
+    def match_url(self, item_name: str) -> Optional[str]:
+        found = self.match(item_name)
+        return found['url'] if found else None
+
+    def _can_beat(self, score: float, i: int, best_score: float, best_i: Optional[int]) -> bool:
+        if score < self.threshold:
+            return False
+        return score > best_score or (score == best_score and best_i is not None and i < best_i)
+
+    def _result(self, i: int, score: float, reason: str) -> Dict:
+        link = self.links[i]
+        return {**link, 'score': round(score, 3), 'reason': reason}
 
 
 # ── Episode helpers ────────────────────────────────────────────────────────────
@@ -192,7 +395,7 @@ def mark_nulls(episode: dict) -> None:
         episode['where_to_find'] = []
 
 
-def enrich_items(episode: dict, bullet_links: List[Dict]) -> int:
+def enrich_items(episode: dict, index: LinkIndex) -> int:
     lr = episode.get('lightning_round') or {}
     added = 0
 
@@ -200,7 +403,7 @@ def enrich_items(episode: dict, bullet_links: List[Dict]) -> int:
         if book.get('url') is not None:
             continue
         name = book.get('title', '')
-        url = best_match_url(f"{name} {book.get('author', '')}", bullet_links) or best_match_url(name, bullet_links)
+        url = index.match_url(f"{name} {book.get('author', '')}") or index.match_url(name)
         book['url'] = url
         if url:
             added += 1
@@ -208,7 +411,7 @@ def enrich_items(episode: dict, bullet_links: List[Dict]) -> int:
     for movie in lr.get('tv_movies') or []:
         if movie.get('url') is not None:
             continue
-        url = best_match_url(movie.get('title', ''), bullet_links)
+        url = index.match_url(movie.get('title', ''))
         movie['url'] = url
         if url:
             added += 1
@@ -216,7 +419,7 @@ def enrich_items(episode: dict, bullet_links: List[Dict]) -> int:
     for product in lr.get('products') or []:
         if product.get('url') is not None:
             continue
-        url = best_match_url(product.get('name', ''), bullet_links)
+        url = index.match_url(product.get('name', ''))
         product['url'] = url
         if url:
             added += 1
@@ -224,76 +427,180 @@ def enrich_items(episode: dict, bullet_links: List[Dict]) -> int:
     return added
 
 
+def share_cluster_urls(recs: list) -> int:
+    """Give items without a URL the URL of another item with the same canonical_id.
+
+    canonical_id is set by dedupe_items.py; items without one are left alone.
+    Returns the number of URLs filled in.
+    """
+    items = []
+    for episode in recs:
+        lr = episode.get('lightning_round') or {}
+        for category in ('books', 'tv_movies', 'products'):
+            items.extend((category, item) for item in lr.get(category) or [] if item.get('canonical_id'))
+
+    known = {}
+    for category, item in items:
+        if item.get('url'):
+            known.setdefault((category, item['canonical_id']), item['url'])
+    shared = 0
+    for category, item in items:
+        url = known.get((category, item['canonical_id']))
+        if item.get('url') is None and url:
+            item['url'] = url
+            shared += 1
+    return shared
+
+
 # ── Main ───────────────────────────────────────────────────────────────────────
 
+def fetch_job(fetcher: PageFetcher, url: str) -> Tuple[Optional[Tuple[List[Dict], List[Dict]]], Optional[str]]:
+    """Fetch and parse one page in a worker thread, feeding each chunk to the parser
+    as it arrives; returns ((bullet_links, where_to_find), None) or (None, error message)."""
+    received = 0
+    fetch_time = 0.0
+
+    def chunks() -> Iterator[bytes]:
+        nonlocal received, fetch_time
+        body = fetcher.fetch_chunks(url)
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(body, None)
+            finally:
+                fetch_time += time.perf_counter() - start
+            if chunk is None:
+                return
+            received += len(chunk)
+            yield chunk
+
+    try:
+        page = extract_page(chunks())
+    except FetchError as e:
+        return None, str(e)
+    except Exception as e:
+        # Anything else (a non-ASCII path, a bad URL...) must not abort the run before it saves
+        return None, f"{type(e).__name__}: {e}"
+    finally:
+        metrics.record("fetch", fetch_time)
+    if not received:
+        return None, "empty page"
+    return page, None
+
+
 def run():
+    parser = argparse.ArgumentParser(description="Enrich recommendations.json from Substack articles.")
+    parser.add_argument("--force", action="store_true", help="Re-scrape all episodes")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Parallel page fetches (default: 4)")
+    parser.add_argument("--offline", action="store_true", help="Only use pages already in the HTTP cache")
+    parser.add_argument("--only", nargs="+", metavar="FILENAME",
+                        help="Only consider these episodes (by transcript filename)")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"Profile the run with cProfile (stats saved in {metrics.METRICS_DIR}/)")
+    args = parser.parse_args()
+
+    with metrics.run("add_item_urls", profile=args.profile):
+        scrape(args)
+
+
+def scrape(args: argparse.Namespace) -> None:
+    """Fetch, parse and match the episodes selected by the arguments, then save."""
     print("Loading recommendations.json...")
-    with open(RECS_FILE, 'r') as f:
+    with metrics.timer("read"), open(RECS_FILE, 'r') as f:
         recs = json.load(f)
 
     total = len(recs)
     with_url = sum(1 for ep in recs if ep.get('substack_url'))
     print(f"  {total} episodes, {with_url} have a Substack URL")
-    if FORCE:
+    if args.force:
         print("  --force: re-scraping all episodes")
-    print()
-
-    total_item_urls = 0
-    total_where_links = 0
-    processed = 0
-    errors = 0
+    if args.offline:
+        print("  --offline: replaying cached pages only")
 
+    jobs = []  # (index, episode, want_items, want_where)
+    only = set(args.only) if args.only else None
     for i, episode in enumerate(recs):
-        substack_url = episode.get('substack_url')
-        guest_names = [g['name'] for g in (episode.get('guests') or [])]
-        guest_label = guest_names[0] if guest_names else '(no guest)'
-
-        if not substack_url:
-            mark_nulls(episode)
+        if only is not None and episode.get('filename') not in only:
             continue
-
-        want_items = FORCE or needs_item_urls(episode)
-        want_where = FORCE or needs_where_to_find(episode)
-
-        if not want_items and not want_where:
-            continue
-
-        print(f"[{i+1}/{total}] {guest_label}")
-        print(f"  {'items+where' if (want_items and want_where) else 'items' if want_items else 'where_to_find'}")
-
-        html = fetch_page(substack_url)
-        if not html:
-            errors += 1
+        if not episode.get('substack_url'):
+            mark_nulls(episode)
             continue
 
-        bullet_links = extract_all_bullet_links(html)
-        print(f"  {len(bullet_links)} bullet links found")
+        want_items = args.force or needs_item_urls(episode)
+        want_where = args.force or needs_where_to_find(episode)
+        if want_items or want_where:
+            jobs.append((i, episode, want_items, want_where))
 
-        if want_items:
-            added = enrich_items(episode, bullet_links)
-            total_item_urls += added
-            print(f"  ✓ {added} item URLs matched")
+    print(f"  {len(jobs)} episodes to scrape ({args.concurrency} parallel fetches)")
+    print()
 
-        if want_where:
-            where = extract_where_to_find(html, guest_names)
-            episode['where_to_find'] = where
-            total_where_links += len(where)
-            if where:
-                print(f"  ✓ {len(where)} Where to Find links: {', '.join(l['label'] for l in where)}")
-            else:
-                print(f"  — No Where to Find links")
+    total_item_urls = 0
+    total_where_links = 0
+    processed = 0
+    errors = 0
 
-        processed += 1
-        time.sleep(RATE_LIMIT_SECONDS)
+    fetcher = PageFetcher(HostLimiter(RATE_LIMIT_SECONDS), cache=HttpCache(), offline=args.offline)
+    pool = ThreadPoolExecutor(max_workers=max(1, args.concurrency))
+    try:
+        futures = {pool.submit(fetch_job, fetcher, job[1]['substack_url']): job for job in jobs}
+
+        # Report each page as soon as it has been parsed rather than in file order
+        for done, future in enumerate(as_completed(futures), 1):
+            i, episode, want_items, want_where = futures[future]
+            guest_names = [g['name'] for g in (episode.get('guests') or [])]
+            guest_label = guest_names[0] if guest_names else '(no guest)'
+
+            print(f"[{done}/{len(jobs)}] {guest_label} (episode {i+1}/{total})")
+            print(f"  {'items+where' if (want_items and want_where) else 'items' if want_items else 'where_to_find'}")
+
+            page, error = future.result()
+            if page is None:
+                print(f"    ⚠ fetch error: {error}")
+                errors += 1
+                continue
+
+            bullet_links, where = page
+            print(f"  {len(bullet_links)} bullet links found")
+
+            if want_items:
+                with metrics.timer("fuzzy_match"):
+                    added = enrich_items(episode, LinkIndex.from_links(bullet_links))
+                total_item_urls += added
+                print(f"  ✓ {added} item URLs matched")
+
+            if want_where:
+                episode['where_to_find'] = where
+                total_where_links += len(where)
+                if where:
+                    print(f"  ✓ {len(where)} Where to Find links: {', '.join(l['label'] for l in where)}")
+                else:
+                    print(f"  — No Where to Find links")
+
+            processed += 1
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        fetcher.close()
+
+    shared = share_cluster_urls(recs)
 
     print(f"\n{'─'*50}")
     print(f"Processed:          {processed} episodes")
     print(f"Item URLs added:    {total_item_urls}")
+    print(f"Shared in clusters: {shared}")
     print(f"Where to Find links:{total_where_links}")
     print(f"Errors:             {errors}")
+    stats = fetcher.stats
+    print(f"HTTP requests:      {stats['requests']} over {stats['connections']} connections, "
+          f"{stats['retries']} retries, {stats['not_modified']} not modified, "
+          f"{stats['bytes_received'] // 1024} KB received")
+    if args.offline:
+        print(f"Served from cache:  {stats['offline_hits']}")
+    metrics.count_all("http", stats)
+    metrics.count_all("episodes", {"processed": processed, "errors": errors, "item_urls": total_item_urls,
+                                   "shared_urls": shared, "where_links": total_where_links})
 
     print("\nSaving recommendations.json...")
-    with open(RECS_FILE, 'w') as f:
+    with metrics.timer("save"), open(RECS_FILE, 'w') as f:
         json.dump(recs, f, indent=2, ensure_ascii=False)
     print("Done! ✓")
     print("\nRemember to copy:")
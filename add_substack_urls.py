@@ -2,44 +2,154 @@
 """
 Add Substack article URLs to recommendations.json by matching guest names
 from the Lenny's Podcast RSS feed.
+
+The feed is cached in .http_cache/ and revalidated with a conditional GET;
+--offline reuses the cached copy without touching the network.
+
+Syncs are incremental: feed items seen before are kept in .feed_state.json, the
+feed is downloaded and parsed newest-first only until the first known item (the
+rest is never fetched), and only episodes
+without a Substack URL are (re)matched — against the whole feed if they have never
+been matched, otherwise against the new items only. Existing URLs are never
+overwritten. --full re-reads the whole feed and retries every unmatched episode.
+
+Stage timings (read, fetch, feed parse, fuzzy match, save) and HTTP counters are
+written to .metrics/ after each run (see metrics.py); --profile adds a cProfile.
 """
 
+import argparse
 import json
+import os
 import re
+import time
 import xml.etree.ElementTree as ET
+from collections import defaultdict
+from contextlib import closing
 from pathlib import Path
-import urllib.request
+
+import metrics
+from http_cache import HostLimiter, HttpCache, PageFetcher
 
 PODCAST_RSS = "https://api.substack.com/feed/podcast/10845.rss"
 RECS_FILE = Path("recommendations.json")
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-}
-
-
-def fetch_podcast_feed():
-    """Fetch the podcast RSS feed."""
-    req = urllib.request.Request(PODCAST_RSS, headers=HEADERS)
-    with urllib.request.urlopen(req) as response:
-        return response.read()
-
-
-def parse_episodes(xml_content):
-    """Extract episodes from podcast RSS feed."""
-    root = ET.fromstring(xml_content)
+FEED_STATE_FILE = Path(".feed_state.json")
+NGRAM_SIZE = 3
+
+
+def stream_podcast_feed(offline=False):
+    """Yield the podcast RSS feed in chunks as it downloads (or from the revalidated cache).
+
+    Closing the generator early drops the connection, so the rest of the feed is
+    never downloaded; the cached copy is then left as it was.
+    """
+    fetcher = PageFetcher(HostLimiter(0), cache=HttpCache(), offline=offline)
+    fetch_time = 0.0
+    try:
+        chunks = fetcher.fetch_chunks(PODCAST_RSS)
+        while True:
+            start = time.perf_counter()
+            chunk = next(chunks, None)
+            fetch_time += time.perf_counter() - start
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        fetcher.close()
+        metrics.record("fetch", fetch_time)
+        metrics.count_all("http", fetcher.stats)
+
+
+def fetch_podcast_feed(offline=False):
+    """Return the whole podcast RSS feed (or the revalidated cached copy)."""
+    return b"".join(stream_podcast_feed(offline))
+
+
+def iter_feed_items(chunks):
+    """Stream episodes out of the podcast RSS feed, in feed order (newest first).
+
+    Chunks are fed to an XMLPullParser as they arrive, so stopping early skips
+    parsing (and, with stream_podcast_feed(), downloading) the rest of the feed.
+    Time spent parsing is recorded as the "feed_parse" stage.
+    """
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    channel = None
+    parse_time = 0.0
+
+    def parsed_items():
+        nonlocal channel
+        items = []
+        for event, elem in parser.read_events():
+            if event == 'start':
+                if elem.tag == 'channel':
+                    channel = elem
+                continue
+            if elem.tag != 'item':
+                continue
+
+            title = elem.findtext('title') or ''
+            url = elem.findtext('link') or ''
+            if title and url:
+                items.append({
+                    'title': title,
+                    'url': url,
+                    'guid': elem.findtext('guid') or url,
+                    'pub_date': elem.findtext('pubDate'),
+                })
+            # Drop parsed items from the tree so memory doesn't grow with the feed
+            elem.clear()
+            if channel is not None:
+                channel.clear()
+        return items
+
+    try:
+        for chunk in chunks:
+            start = time.perf_counter()
+            parser.feed(chunk)
+            items = parsed_items()
+            parse_time += time.perf_counter() - start
+            yield from items
+        start = time.perf_counter()
+        parser.close()
+        items = parsed_items()
+        parse_time += time.perf_counter() - start
+        yield from items
+    finally:
+        metrics.record("feed_parse", parse_time)
+
+
+def parse_new_episodes(chunks, known):
+    """Parse feed items up to the first one whose guid or URL is already known.
+
+    The feed stops downloading there: chunks is closed on the way out.
+    """
     episodes = []
+    with closing(chunks):
+        for ep in iter_feed_items(chunks):
+            if ep['guid'] in known or ep['url'] in known:
+                break
+            episodes.append(ep)
+    return episodes
 
-    for item in root.findall('.//item'):
-        title_elem = item.find('title')
-        link_elem = item.find('link')
 
-        if title_elem is not None and link_elem is not None:
-            title = title_elem.text or ''
-            url = link_elem.text or ''
-            if title and url:
-                episodes.append({'title': title, 'url': url})
+def load_feed_state():
+    """Return the feed items seen by earlier syncs, newest first."""
+    if not FEED_STATE_FILE.exists():
+        return []
+    with metrics.timer("read"), open(FEED_STATE_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f).get('items', [])
 
-    return episodes
+
+def save_feed_state(items):
+    state = {
+        'last_guid': items[0]['guid'] if items else None,
+        'last_pub_date': items[0]['pub_date'] if items else None,
+        'items': items,
+    }
+    tmp = FEED_STATE_FILE.with_suffix('.tmp')
+    with metrics.timer("save"):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, FEED_STATE_FILE)
 
 
 def normalize(text):
@@ -57,65 +167,180 @@ def extract_guest_from_title(title):
     return None
 
 
-def find_matching_url(guest_names, podcast_episodes):
-    """Find podcast episode URL matching any of the guest names."""
-    for guest_name in guest_names:
-        normalized_guest = normalize(guest_name)
-        guest_parts = normalized_guest.split()
-        last_name = guest_parts[-1] if guest_parts else ''
+def ngrams(text, n=NGRAM_SIZE):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
 
-        for ep in podcast_episodes:
-            # Strategy 1: Match against extracted guest name from "Topic | Guest (Company)" format
-            ep_guest = extract_guest_from_title(ep['title'])
-            if ep_guest:
-                normalized_ep_guest = normalize(ep_guest)
-                if last_name and len(last_name) > 2 and last_name in normalized_ep_guest:
-                    if len(guest_parts) >= 2:
-                        first_name = guest_parts[0]
-                        if first_name in normalized_ep_guest:
-                            return ep['url']
-                    else:
-                        return ep['url']
-
-            # Strategy 2: Match guest name parts in full title (handles all formats)
-            normalized_title = normalize(ep['title'])
-            if len(guest_parts) >= 2 and all(part in normalized_title for part in guest_parts if len(part) > 2):
-                return ep['url']
 
-    return None
+class FeedIndex:
+    """One-time index over the parsed feed for guest-name lookups.
+
+    Every episode's normalized title, and the guest name extracted from it, are
+    posted under their character trigrams. A name part is then found by
+    intersecting the postings of its trigrams (rarest first) and confirming the
+    substring on that short list, so matching costs lookups plus a small
+    intersection instead of a pass over the whole feed.
+    """
+
+    def __init__(self, podcast_episodes):
+        self.episodes = podcast_episodes
+        self.titles = []
+        self.guests = []
+        self._title_postings = defaultdict(set)
+        self._guest_postings = defaultdict(set)
+
+        for i, ep in enumerate(podcast_episodes):
+            title = normalize(ep['title'])
+            ep_guest = extract_guest_from_title(ep['title'])
+            guest = normalize(ep_guest) if ep_guest else None
+            self.titles.append(title)
+            self.guests.append(guest)
+            for gram in ngrams(title):
+                self._title_postings[gram].add(i)
+            for gram in ngrams(guest or ''):
+                self._guest_postings[gram].add(i)
+
+    def _containing(self, part, texts, postings):
+        """Ids of episodes whose text contains `part` (at least NGRAM_SIZE chars)."""
+        lists = sorted((postings.get(gram, set()) for gram in ngrams(part)), key=len)
+        if not lists or not lists[0]:
+            return set()
+        ids = set(lists[0])
+        for other in lists[1:]:
+            ids &= other
+            if not ids:
+                return ids
+        return {i for i in ids if part in texts[i]}
+
+    def candidates(self, guest_name):
+        """All episodes matching one guest name, best first.
+
+        Returns dicts with the episode's id (feed position), title, url, score and
+        reason: "guest" when the name matches the guest in a "Topic | Guest (Company)"
+        title, "title" when every name part appears somewhere in the title. Names
+        matching only as substrings of longer words score 0.1 lower.
+        """
+        guest_parts = normalize(guest_name).split()
+        if not guest_parts:
+            return []
+        last_name = guest_parts[-1]
+        found = {}
+
+        # Strategy 1: Match against extracted guest name from "Topic | Guest (Company)" format
+        if len(last_name) > 2:
+            for i in self._containing(last_name, self.guests, self._guest_postings):
+                if len(guest_parts) < 2 or guest_parts[0] in self.guests[i]:
+                    found[i] = ('guest', self.guests[i])
+
+        # Strategy 2: Match guest name parts in full title (handles all formats)
+        if len(guest_parts) >= 2:
+            long_parts = [part for part in guest_parts if len(part) > 2]
+            if long_parts:
+                ids = self._containing(long_parts[0], self.titles, self._title_postings)
+                for part in long_parts[1:]:
+                    ids &= self._containing(part, self.titles, self._title_postings)
+            else:
+                ids = set(range(len(self.episodes)))
+            for i in ids:
+                found.setdefault(i, ('title', self.titles[i]))
+
+        results = []
+        for i, (reason, text) in found.items():
+            words = set(text.split())
+            score = 1.0 if reason == 'guest' else 0.7
+            if reason == 'guest' and len(guest_parts) >= 2:
+                matched = [guest_parts[0], last_name]
+            else:
+                matched = [part for part in guest_parts if len(part) > 2] or [last_name]
+            if not all(part in words for part in matched):
+                score -= 0.1
+            ep = self.episodes[i]
+            results.append({'id': i, 'title': ep['title'], 'url': ep['url'],
+                            'score': round(score, 2), 'reason': reason})
+        results.sort(key=lambda c: (-c['score'], c['id']))
+        return results
+
+
+def match_episodes(guest_names, index):
+    """Candidate episodes for the first guest name that matches any, best first."""
+    with metrics.timer("fuzzy_match"):
+        for guest_name in guest_names:
+            candidates = index.candidates(guest_name)
+            if candidates:
+                return candidates
+        return []
+
+
+def earliest_url(candidates):
+    """URL of the candidate earliest in the feed (what the old linear scan returned)."""
+    if not candidates:
+        return None
+    return min(candidates, key=lambda c: c['id'])['url']
+
+
+def find_matching_url(guest_names, index):
+    """Find podcast episode URL matching any of the guest names."""
+    return earliest_url(match_episodes(guest_names, index))
 
 
 def add_urls_to_recommendations():
     """Add Substack URLs to recommendations.json."""
-    print("Fetching podcast RSS feed...")
-    xml_content = fetch_podcast_feed()
+    parser = argparse.ArgumentParser(description="Match episodes to their Substack articles.")
+    parser.add_argument("--offline", action="store_true", help="Use the cached RSS feed only")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore the saved feed state: re-read the whole feed and retry every unmatched episode")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"Profile the run with cProfile (stats saved in {metrics.METRICS_DIR}/)")
+    args = parser.parse_args()
+
+    with metrics.run("add_substack_urls", profile=args.profile):
+        sync(args)
+
+
+def sync(args):
+    """Match episodes without a Substack URL against the feed, as described by the arguments."""
 
-    print("Parsing podcast episodes...")
-    podcast_episodes = parse_episodes(xml_content)
-    print(f"Found {len(podcast_episodes)} podcast episodes\n")
+    known_items = [] if args.full else load_feed_state()
+    known = {ep['guid'] for ep in known_items} | {ep['url'] for ep in known_items}
 
-    # Show some examples
-    print("Sample episodes:")
-    for ep in podcast_episodes[:3]:
-        print(f"  {ep['title'][:100]}")
-        print(f"  {ep['url']}")
-        print()
+    print("Fetching and parsing podcast RSS feed...")
+    new_items = parse_new_episodes(stream_podcast_feed(offline=args.offline), known)
+    all_items = new_items + known_items
+    print(f"Found {len(new_items)} new podcast episodes ({len(all_items)} known in total)\n")
+
+    if new_items:
+        print("New episodes:")
+        for ep in new_items[:3]:
+            print(f"  {ep['title'][:100]}")
+            print(f"  {ep['url']}")
+            print()
 
     print("Loading recommendations...")
-    with open(RECS_FILE, 'r') as f:
+    with metrics.timer("read"), open(RECS_FILE, 'r') as f:
         recs = json.load(f)
 
+    # Never-matched episodes search the whole feed; ones that failed before can
+    # only match an item that has appeared since
+    full_index = None
+    with metrics.timer("match_index"):
+        new_index = FeedIndex(new_items)
+
     matched = 0
     unmatched = 0
+    skipped = 0
     unmatched_list = []
 
     print("Matching episodes to articles...\n")
     for episode in recs:
+        if episode.get('substack_url'):
+            skipped += 1
+            continue
+
         # Skip compilation episodes - they aggregate multiple episodes
         if 'Compilation' in episode.get('filename', ''):
-            episode['substack_url'] = None
+            if 'substack_url' not in episode:
+                episode['substack_url'] = None
+                print(f"  ⊘ Skipping compilation: {episode.get('filename')}")
             unmatched += 1
-            print(f"  ⊘ Skipping compilation: {episode.get('filename')}")
             continue
 
         guest_names = [g['name'] for g in episode.get('guests', [])]
@@ -124,18 +349,28 @@ def add_urls_to_recommendations():
             unmatched += 1
             continue
 
-        url = find_matching_url(guest_names, podcast_episodes)
+        if 'substack_url' not in episode or args.full:
+            if full_index is None:
+                with metrics.timer("match_index"):
+                    full_index = FeedIndex(all_items)
+            index = full_index
+        else:
+            index = new_index
+
+        candidates = match_episodes(guest_names, index)
+        url = earliest_url(candidates)
 
         if url:
             episode['substack_url'] = url
             matched += 1
-            print(f"  ✓ {guest_names[0]}")
+            others = f" ({len(candidates) - 1} other candidates)" if len(candidates) > 1 else ""
+            print(f"  ✓ {guest_names[0]}{others}")
         else:
             episode['substack_url'] = None
             unmatched += 1
             unmatched_list.append(guest_names[0])
 
-    print(f"\nMatched: {matched}, Unmatched: {unmatched}")
+    print(f"\nMatched: {matched}, Unmatched: {unmatched}, Already matched: {skipped}")
 
     if unmatched_list:
         print(f"\nUnmatched guests ({len(unmatched_list)}):")
@@ -143,11 +378,16 @@ def add_urls_to_recommendations():
             print(f"  - {name}")
 
     print("\nSaving updated recommendations...")
-    with open(RECS_FILE, 'w') as f:
+    metrics.count_all("episodes", {"matched": matched, "unmatched": unmatched, "already_matched": skipped})
+    with metrics.timer("save"), open(RECS_FILE, 'w') as f:
         json.dump(recs, f, indent=2, ensure_ascii=False)
 
+    # Only after recommendations are saved: a crash in between must not mark new
+    # items as seen before unmatched episodes have been checked against them
+    save_feed_state(all_items)
+
     print("Done!")
 
 
 if __name__ == "__main__":
-    add_urls_to_recommendations()
+    add_urls_to_recommendations()
\ No newline at end of file
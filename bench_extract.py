@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end throughput benchmark for extract_recs.py.
+
+Starts fake_llm_server.py in-process, points the Groq and Gemini clients at it and
+runs extract_recs.main() over the real transcript corpus, writing to a scratch
+directory so recommendations.json, the caches, the transcript index and .metrics/
+are left untouched. Reports episodes/sec, p50/p95 request latency (as metrics.py
+computes them), retries and fallback counts, so changes to concurrency, batching
+or caching can be compared run to run without network access.
+
+Usage:
+    pip install groq google-genai
+    python3 bench_extract.py --concurrency 8
+    python3 bench_extract.py --concurrency 4 --batch-tokens 12000 --groq-rpm 60 --error-rate 0.05
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import extract_recs
+import metrics
+from fake_llm_server import FakeLLMServer
+
+
+def timed(fn, latencies: list[float], lock: threading.Lock):
+    """Wrap a request function so every call's wall time is recorded, failed or not."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with lock:
+                latencies.append(time.perf_counter() - start)
+    return wrapper
+
+
+def run_benchmark(args) -> dict:
+    server = FakeLLMServer(
+        latency=args.latency, jitter=args.jitter,
+        groq_rpm=args.groq_rpm, gemini_rpm=args.gemini_rpm,
+        error_rate=args.error_rate, malformed_rate=args.malformed_rate, seed=args.seed,
+    ).start()
+
+    os.environ["GROQ_API_KEY"] = "bench"
+    os.environ["GROQ_BASE_URL"] = server.url
+    os.environ["GEMINI_BASE_URL"] = server.url
+    if args.no_gemini:
+        os.environ.pop("GOOGLE_API_KEY", None)
+    else:
+        os.environ["GOOGLE_API_KEY"] = "bench"
+
+    latencies: list[float] = []
+    lock = threading.Lock()
+    extract_recs.request_groq = timed(extract_recs.request_groq, latencies, lock)
+    extract_recs.request_gemini = timed(extract_recs.request_gemini, latencies, lock)
+    # Client-side pacing, scaled so a benchmark doesn't take as long as a real run
+    extract_recs.GROQ_LIMITER = extract_recs.RateLimiter(
+        extract_recs.GROQ_RPM * args.quota_scale, extract_recs.GROQ_TPM * args.quota_scale)
+    extract_recs.GEMINI_LIMITER = extract_recs.RateLimiter(
+        extract_recs.GEMINI_RPM * args.quota_scale, extract_recs.GEMINI_TPM * args.quota_scale)
+
+    argv = ["extract_recs.py", "--concurrency", str(args.concurrency)]
+    if args.batch_tokens:
+        argv += ["--batch-tokens", str(args.batch_tokens)]
+    if args.limit:
+        argv += ["--limit", str(args.limit)]
+    if not args.cache:
+        argv.append("--no-cache")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        scratch = Path(scratch)
+        extract_recs.TRANSCRIPTS_DIR = extract_recs.TRANSCRIPTS_DIR.resolve()
+        extract_recs.OUTPUT_FILE = scratch / "recommendations.json"
+        extract_recs.RESULTS_LOG = scratch / "recommendations.jsonl"
+        extract_recs.CACHE_DIR = scratch / "llm_cache"
+        extract_recs.SECTIONS_CACHE_FILE = scratch / "sections_cache.json"
+        # No index in the scratch directory, so the (unmeasured) transcript check is skipped
+        extract_recs.INDEX_FILE = scratch / "transcript_index.sqlite"
+        metrics.METRICS_DIR = scratch / "metrics"
+
+        # Section extraction isn't what's being measured; warm its cache first
+        all_files = sorted(extract_recs.TRANSCRIPTS_DIR.glob("*.txt"))
+        sections_cache = {}
+        extract_recs.refresh_sections_cache(all_files, sections_cache)
+        extract_recs.save_sections_cache(sections_cache)
+
+        log = io.StringIO()
+        sys.argv = argv
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else log):
+            summary = extract_recs.main()
+        elapsed = time.perf_counter() - start
+
+    server.stop()
+
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "verbose")},
+        "elapsed_seconds": round(elapsed, 3),
+        "episodes": summary["processed"],
+        "errors": summary["errors"],
+        "episodes_per_second": round(summary["processed"] / elapsed, 3) if elapsed else 0.0,
+        "requests": len(latencies),
+        "latency_p50": round(metrics.percentile(latencies, 50), 4),
+        "latency_p95": round(metrics.percentile(latencies, 95), 4),
+        "retries": summary["router"]["retries"],
+        "fallbacks": summary["router"]["fallbacks"],
+        "providers": summary["providers"],
+        "server": server.stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extract_recs.py against an offline LLM stand-in.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--batch-tokens", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many episodes")
+    parser.add_argument("--cache", action="store_true", help="Use a (scratch) response cache")
+    parser.add_argument("--no-gemini", action="store_true", help="Run with Groq only")
+    parser.add_argument("--quota-scale", type=float, default=10.0,
+                        help="Multiply the client-side RPM/TPM limits (default: 10)")
+    parser.add_argument("--latency", type=float, default=0.3, help="Mean server latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--groq-rpm", type=int, default=0, help="Server-side Groq quota (0 = unlimited)")
+    parser.add_argument("--gemini-rpm", type=int, default=0, help="Server-side Gemini quota (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None, help="Also write the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show extract_recs output")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+
+    print(f"Episodes:     {report['episodes']} in {report['elapsed_seconds']}s "
+          f"({report['episodes_per_second']} episodes/sec), {report['errors']} errors")
+    print(f"Requests:     {report['requests']} "
+          f"(p50 {report['latency_p50'] * 1000:.0f} ms, p95 {report['latency_p95'] * 1000:.0f} ms)")
+    print(f"Retries:      {report['retries']}")
+    print(f"Fallbacks:    {report['fallbacks']}")
+    for name, stats in report["providers"].items():
+        print(f"  {name:<8}    {stats}")
+    print(f"Server:       {report['server']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Cluster near-duplicate recommended items across episodes and tag them with canonical ids.
+
+The same book or product turns up under variant spellings ("Radical Candor" vs
+"Radical Candor by Kim Scott", "Notion" vs "Notion app"). Within each category, every
+distinct normalized name becomes a TF-IDF vector over its character trigrams; pairs
+whose cosine similarity reaches the threshold are joined with union-find, and each
+item gets the key of its cluster's most common spelling as "canonical_id".
+
+The cosine similarities are a sparse product computed with NumPy in row blocks: each
+block's trigrams are expanded against the trigram postings of the rows after it, so
+only pairs sharing a trigram are ever scored, and the block size bounds memory.
+
+add_item_urls.py shares URLs between items with the same canonical id, and
+export_web_data.py aggregates on it.
+
+Run: python3 dedupe_items.py [--threshold 0.85] [--dry-run]
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from export_web_data import canonical_key
+
+RECS_FILE = Path("recommendations.json")
+SIMILARITY_THRESHOLD = 0.85
+NGRAM_SIZE = 3
+BLOCK_PRODUCTS = 4_000_000   # partial products computed per block (bounds memory)
+# Category -> field holding the item's name
+CATEGORIES = {"books": "title", "tv_movies": "title", "products": "name"}
+
+
+def char_ngrams(text: str, n: int = NGRAM_SIZE) -> list[str]:
+    padded = f" {text} "
+    return [padded[i:i + n] for i in range(len(padded) - n + 1)]
+
+
+def tfidf_matrix(texts: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """L2-normalized TF-IDF rows over character n-grams, as CSR (indptr, indices, data).
+
+    Uses sublinear term frequency and smoothed idf. Every text must be non-empty, so
+    that every row has at least one n-gram.
+    """
+    vocabulary = {}
+    indices, counts, lengths = [], [], []
+    for text in texts:
+        grams = Counter(char_ngrams(text))
+        indices.extend(vocabulary.setdefault(gram, len(vocabulary)) for gram in grams)
+        counts.extend(grams.values())
+        lengths.append(len(grams))
+
+    indptr = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    indices = np.asarray(indices, dtype=np.int64)
+    df = np.bincount(indices, minlength=len(vocabulary))
+    idf = np.log((1 + len(texts)) / (1 + df)) + 1
+    data = (1 + np.log(np.asarray(counts, dtype=np.float64))) * idf[indices]
+    norms = np.sqrt(np.add.reduceat(data ** 2, indptr[:-1]))
+    data /= np.repeat(norms, lengths)
+    return indptr, indices, data
+
+
+def expand_postings(rows: np.ndarray, cols: np.ndarray, bounds: np.ndarray, threshold: float, n_rows: int,
+                    block_products: int = BLOCK_PRODUCTS) -> np.ndarray:
+    """Return candidate pairs of rows, as sorted keys i * n_rows + j with i < j.
+
+    `rows`/`cols` list the stored entries sorted by row. Each entry (i, g) is paired
+    with the entries (j, g) of the same column with j > i, read from a column-sorted
+    copy, and the pair is a candidate if bounds[i, g] * bounds[j, g] >= threshold for
+    some shared column. Rows are processed in blocks of about `block_products` pairings.
+    """
+    if not len(rows):
+        return np.empty(0, dtype=np.int64)
+    order = np.argsort(cols, kind="stable")   # stable: rows stay ascending within a column
+    col_rows, col_bounds = rows[order], bounds[order]
+    col_ptr = np.concatenate([[0], np.cumsum(np.bincount(cols))])
+    # For each entry, where the rows after it start in its column, and how many there are
+    later_start = np.empty_like(order)
+    later_start[order] = np.arange(len(order)) + 1
+    later_count = col_ptr[cols + 1] - later_start
+
+    cost = np.concatenate([[0], np.cumsum(later_count)])
+    splits = np.unique(np.searchsorted(cost, np.arange(0, cost[-1], block_products), side="right") - 1)
+    # Blocks end on row boundaries, so each pair comes from exactly one block
+    splits = np.unique(np.append(np.searchsorted(rows, rows[splits], side="left"), len(rows)))
+
+    found = []
+    for lo, hi in zip(splits[:-1], splits[1:]):
+        counts = later_count[lo:hi]
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        entry = np.repeat(np.arange(lo, hi), counts)
+        pos = later_start[entry] + np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        keep = bounds[entry] * col_bounds[pos] >= threshold - 1e-9
+        found.append(np.unique(rows[entry[keep]] * n_rows + col_rows[pos[keep]]))
+    return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+
+def similar_pairs(indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, threshold: float,
+                  block_products: int = BLOCK_PRODUCTS) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return (i, j, cosine) for every pair of rows i < j with cosine >= threshold.
+
+    Candidates come from a prefix filter. With each row's n-grams ordered rarest
+    first, let tail(g) be the norm of the row from n-gram g onwards. If g is the
+    first n-gram two rows share, their cosine is at most tail_i(g) * tail_j(g), so
+    only n-grams with tail >= threshold (mostly rare ones, with short postings) are
+    expanded, and only pairs where that bound reaches the threshold are kept. The
+    candidates' exact cosines are then summed from the full rows.
+    """
+    n_rows = len(indptr) - 1
+    n_cols = int(indices.max(initial=-1)) + 1
+    lengths = np.diff(indptr)
+    rows = np.repeat(np.arange(n_rows), lengths)
+
+    # Order each row's entries rarest n-gram first, then keep those whose tail norm reaches the threshold
+    rank = np.empty(n_cols, dtype=np.int64)
+    rank[np.argsort(np.bincount(indices, minlength=n_cols), kind="stable")] = np.arange(n_cols)
+    order = np.lexsort((rank[indices], rows))
+    squares = data[order] ** 2
+    before = np.cumsum(squares) - squares
+    row_total = np.repeat(before[indptr[:-1]] + np.add.reduceat(squares, indptr[:-1]), lengths) if n_rows else before
+    tail = np.sqrt(np.maximum(row_total - before, 0))
+    prefix = order[tail >= threshold - 1e-9]
+    candidates = expand_postings(rows[prefix], indices[prefix], tail[tail >= threshold - 1e-9], threshold,
+                                 n_rows, block_products)
+
+    # Exact cosines: look up each entry of row i in row j
+    keys = rows * n_cols + indices
+    by_key = np.argsort(keys)
+    sorted_keys = keys[by_key]
+    found_i, found_j, found_sim = [], [], []
+    per_chunk = max(1, block_products // max(1, int(lengths.max(initial=1))))
+    for chunk in range(0, len(candidates), per_chunk):
+        pair_keys = candidates[chunk:chunk + per_chunk]
+        ci, cj = pair_keys // n_rows, pair_keys % n_rows
+        counts = lengths[ci]
+        pair = np.repeat(np.arange(len(pair_keys)), counts)
+        entry = np.repeat(indptr[ci], counts) + np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+        target = cj[pair] * n_cols + indices[entry]
+        pos = np.minimum(np.searchsorted(sorted_keys, target), len(sorted_keys) - 1)
+        hit = sorted_keys[pos] == target
+        sims = np.bincount(pair[hit], weights=data[entry[hit]] * data[by_key[pos[hit]]], minlength=len(pair_keys))
+        keep = sims >= threshold
+        found_i.append(ci[keep])
+        found_j.append(cj[keep])
+        found_sim.append(sims[keep])
+
+    if not found_i:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_sim)
+
+
+def cluster_labels(n: int, pairs_i: np.ndarray, pairs_j: np.ndarray) -> np.ndarray:
+    """Union-find over the similar pairs; returns a root label per row."""
+    parent = list(range(n))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j in zip(pairs_i.tolist(), pairs_j.tolist()):
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    return np.array([find(x) for x in range(n)], dtype=np.int64)
+
+
+def canonical_ids(names: list[str], threshold: float = SIMILARITY_THRESHOLD) -> tuple[list[str], dict]:
+    """Map each name to the key of its cluster's most common spelling.
+
+    Returns (canonical id per name, {spelling: canonical id} for the spellings that
+    were merged into another). Names that normalize to nothing get an empty id.
+    """
+    keys = [canonical_key(name or "") for name in names]
+    frequency = Counter(key for key in keys if key)
+    distinct = sorted(frequency)
+    if not distinct:
+        return ["" for _ in names], {}
+
+    pairs_i, pairs_j, _ = similar_pairs(*tfidf_matrix(distinct), threshold)
+    labels = cluster_labels(len(distinct), pairs_i, pairs_j)
+
+    # Representative: most frequent spelling, then the shortest, then alphabetical
+    best = {}
+    for position, key in enumerate(distinct):
+        label = int(labels[position])
+        rank = (-frequency[key], len(key), key)
+        if label not in best or rank < best[label][0]:
+            best[label] = (rank, key)
+    canonical = {key: best[int(labels[position])][1] for position, key in enumerate(distinct)}
+
+    merges = {key: cid for key, cid in canonical.items() if key != cid}
+    return [canonical.get(key, "") for key in keys], merges
+
+
+def assign_canonical_ids(recs: list, threshold: float = SIMILARITY_THRESHOLD) -> dict:
+    """Set "canonical_id" on every book, TV/movie and product; returns per-category stats."""
+    stats = {}
+    for category, name_field in CATEGORIES.items():
+        items = [item for ep in recs for item in (ep.get("lightning_round") or {}).get(category) or []]
+        ids, merges = canonical_ids([item.get(name_field) for item in items], threshold)
+        changed = 0
+        for item, cid in zip(items, ids):
+            cid = cid or None
+            if item.get("canonical_id") != cid:
+                item["canonical_id"] = cid
+                changed += 1
+        stats[category] = {
+            "items": len(items),
+            "spellings": len({canonical_key(item.get(name_field) or "") for item in items}),
+            "clusters": len(set(ids) - {""}),
+            "changed": changed,
+            "merges": merges,
+        }
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tag near-duplicate recommended items with canonical ids.")
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD,
+                        help=f"Cosine similarity needed to merge two spellings (default: {SIMILARITY_THRESHOLD})")
+    parser.add_argument("--dry-run", action="store_true", help="Print the merges without saving")
+    args = parser.parse_args()
+
+    with open(RECS_FILE, "r", encoding="utf-8") as f:
+        recs = json.load(f)
+
+    start = time.perf_counter()
+    stats = assign_canonical_ids(recs, args.threshold)
+    elapsed = time.perf_counter() - start
+
+    for category, s in stats.items():
+        print(f"{category:<10} {s['items']:5} items, {s['spellings']:5} spellings → {s['clusters']:5} clusters "
+              f"({s['changed']} ids changed)")
+        if args.dry_run:
+            for key, cid in sorted(s["merges"].items(), key=lambda kv: kv[1]):
+                print(f"    {key!r} → {cid!r}")
+    print(f"Clustered in {elapsed:.2f}s")
+
+    if args.dry_run or not any(s["changed"] for s in stats.values()):
+        return
+    tmp = RECS_FILE.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(recs, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, RECS_FILE)
+    print(f"Saved canonical ids to {RECS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
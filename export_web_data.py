@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Export recommendations.json as compact, sharded, precompressed files for the web app.
+
+Writes to web/public/data/:
+
+    manifest.json                      entry point (not hashed; serve with no-cache)
+    index/episodes.<hash>.json         episode id, guest names, Substack URL
+    index/books.<hash>.json            one row per recommendation: episode, title, author, url
+    index/tv_movies.<hash>.json        episode, title, type, url
+    index/products.<hash>.json         episode, name, url
+    index/mottos.<hash>.json           episode, life motto
+    index/aggregates.<hash>.json       canonical items with counts + cross-reference indexes
+    episodes/<id>.<hash>.json          the full episode record (why text, reach, where_to_find...)
+
+Index shards are column-oriented ({"columns": [...], "rows": [[...], ...]}) and leave
+out the bulky fields, so a catalog page only needs the manifest, the episodes index and
+its own category. The aggregates shard does the catalog pages' de-duplication once per
+export: canonical items (keyed on the canonical_id from dedupe_items.py, else the same
+keys as normalizeTitle in web/src/data/canvasUtils.ts) ranked by recommendation count,
+with item→episodes, guest→items and author→books lookups. Episode numbers everywhere are
+row numbers in the episodes index.
+
+Every file is minified JSON with .gz and (if the brotli package is installed) .br
+siblings, named by a hash of its contents so each shard busts caches on its own. The
+manifest is written last and superseded shards are deleted after it.
+
+The web app still loads /recommendations.json, so pipeline.py doesn't publish these
+files; run this by hand until the app has a loader that reads the manifest.
+
+Run: python3 export_web_data.py
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # optional: only .gz siblings are written without it
+    brotli = None
+
+RECS_FILE = Path("recommendations.json")
+DATA_DIR = Path("web/public/data")
+MANIFEST_FILE = DATA_DIR / "manifest.json"
+SCHEMA_VERSION = 1
+HASH_CHARS = 10
+
+AGGREGATE_COLUMNS = {
+    "items": ["key", "title", "author", "count", "episodes", "url"],
+    "guests": ["name", "episodes", "books", "tv_movies", "products"],
+    "authors": ["author", "books"],
+}
+ITEM_CATEGORIES = {"books": "title", "tv_movies": "title", "products": "name"}
+AUTHOR_SEPARATORS_RE = re.compile(r"\s*(?:,|&|\band\b)\s*")
+
+INDEX_COLUMNS = {
+    "episodes": ["id", "guests", "substack_url"],
+    "books": ["episode", "title", "author", "url"],
+    "tv_movies": ["episode", "title", "type", "url"],
+    "products": ["episode", "name", "url"],
+    "mottos": ["episode", "life_motto"],
+}
+
+
+def minify(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def episode_id(filename: str, taken: set) -> str:
+    """URL-safe id from the transcript filename, e.g. "Ada Chen Rekhi.txt" -> "ada-chen-rekhi"."""
+    base = re.sub(r"[^a-z0-9]+", "-", Path(filename).stem.lower()).strip("-") or "episode"
+    slug, n = base, 2
+    while slug in taken:
+        slug, n = f"{base}-{n}", n + 1
+    taken.add(slug)
+    return slug
+
+
+def build_shards(recs: list) -> tuple[dict, dict]:
+    """Return ({index name: shard}, {episode id: episode record})."""
+    rows = {name: [] for name in INDEX_COLUMNS}
+    episodes = {}
+    taken = set()
+
+    for ep in recs:
+        eid = episode_id(ep["filename"], taken)
+        episodes[eid] = ep
+        n = len(rows["episodes"])
+        lr = ep.get("lightning_round") or {}
+
+        rows["episodes"].append([eid, [g.get("name") for g in ep.get("guests") or []], ep.get("substack_url")])
+        for book in lr.get("books") or []:
+            rows["books"].append([n, book.get("title"), book.get("author"), book.get("url")])
+        for movie in lr.get("tv_movies") or []:
+            rows["tv_movies"].append([n, movie.get("title"), movie.get("type"), movie.get("url")])
+        for product in lr.get("products") or []:
+            rows["products"].append([n, product.get("name"), product.get("url")])
+        if lr.get("life_motto"):
+            rows["mottos"].append([n, lr["life_motto"]])
+
+    indexes = {
+        name: {"schema": SCHEMA_VERSION, "columns": INDEX_COLUMNS[name], "rows": rows[name]}
+        for name in INDEX_COLUMNS
+    }
+    return indexes, episodes
+
+
+def canonical_key(title: str, strip_author_suffix: bool = False) -> str:
+    """Python port of normalizeTitle() in web/src/data/canvasUtils.ts."""
+    if strip_author_suffix:
+        title = re.sub(r"\s*[-–]\s*[A-Z][^-–]*$", "", title)
+    title = title.lower()
+    title = re.sub(r"^(the|a|an)\s+", "", title, flags=re.IGNORECASE)
+    return re.sub(r"[^\w\s]", "", title, flags=re.ASCII).strip()
+
+
+def build_aggregates(recs: list) -> dict:
+    """Canonical items per category, ranked by count, plus guest and author indexes.
+
+    Mirrors aggregateItems() in canvasUtils.ts: books are keyed on "Title - Author"
+    with the author suffix stripped, the longest title variant wins, and count is
+    the number of distinct guest lineups recommending the item. Items tagged by
+    dedupe_items.py are keyed on their canonical_id instead, so variant spellings
+    are counted together.
+    """
+    items = {}
+    for category, name_field in ITEM_CATEGORIES.items():
+        entities = {}
+        for n, ep in enumerate(recs):
+            lineup = " & ".join(g.get("name") or "" for g in ep.get("guests") or [])
+            for item in (ep.get("lightning_round") or {}).get(category) or []:
+                title = item.get(name_field)
+                if not title or title == "null":
+                    continue
+                author = item.get("author") if category == "books" else None
+                display = f"{title} - {author}" if author else title
+                key = item.get("canonical_id") or canonical_key(display, strip_author_suffix=(category == "books"))
+                entity = entities.setdefault(key, {"key": key, "title": title, "author": author,
+                                                   "lineups": [], "episodes": [], "url": None})
+                if len(title) > len(entity["title"]):
+                    entity["title"] = title
+                entity["author"] = entity["author"] or author
+                entity["url"] = entity["url"] or item.get("url")
+                if lineup not in entity["lineups"]:
+                    entity["lineups"].append(lineup)
+                if n not in entity["episodes"]:
+                    entity["episodes"].append(n)
+        ranked = sorted(entities.values(), key=lambda e: (-len(e["lineups"]), e["key"]))
+        items[category] = {
+            "columns": AGGREGATE_COLUMNS["items"],
+            "rows": [[e["key"], e["title"], e["author"], len(e["lineups"]), e["episodes"], e["url"]]
+                     for e in ranked],
+        }
+
+    # Item row numbers by (category, episode), for the guest index
+    rows_by_episode = {category: {} for category in ITEM_CATEGORIES}
+    for category, table in items.items():
+        for row_number, row in enumerate(table["rows"]):
+            for n in row[4]:
+                rows_by_episode[category].setdefault(n, []).append(row_number)
+
+    guests = {}
+    for n, ep in enumerate(recs):
+        for guest in ep.get("guests") or []:
+            name = guest.get("name")
+            if not name:
+                continue
+            entry = guests.setdefault(name, {"episodes": [], **{c: [] for c in ITEM_CATEGORIES}})
+            entry["episodes"].append(n)
+            for category in ITEM_CATEGORIES:
+                entry[category].extend(r for r in rows_by_episode[category].get(n, []) if r not in entry[category])
+
+    authors = {}
+    for row_number, row in enumerate(items["books"]["rows"]):
+        for author in AUTHOR_SEPARATORS_RE.split(row[2] or ""):
+            if author:
+                authors.setdefault(author, []).append(row_number)
+
+    return {
+        "schema": SCHEMA_VERSION,
+        "items": items,
+        "guests": {
+            "columns": AGGREGATE_COLUMNS["guests"],
+            "rows": [[name, g["episodes"], g["books"], g["tv_movies"], g["products"]]
+                     for name, g in sorted(guests.items())],
+        },
+        "authors": {
+            "columns": AGGREGATE_COLUMNS["authors"],
+            "rows": [[author, books] for author, books in sorted(authors.items())],
+        },
+    }
+
+
+def write_shard(relative_stem: str, data) -> dict:
+    """Write one content-hashed shard plus compressed siblings; return its manifest entry."""
+    raw = minify(data)
+    digest = hashlib.sha256(raw).hexdigest()[:HASH_CHARS]
+    relative = f"{relative_stem}.{digest}.json"
+    path = DATA_DIR / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    entry = {"path": relative, "bytes": len(raw)}
+    gz = gzip.compress(raw, compresslevel=9, mtime=0)
+    entry["gzip_bytes"] = len(gz)
+    variants = [(path, raw), (path.with_name(path.name + ".gz"), gz)]
+    if brotli is not None:
+        br = brotli.compress(raw, quality=11)
+        entry["br_bytes"] = len(br)
+        variants.append((path.with_name(path.name + ".br"), br))
+
+    # Same name means same content, so an existing file is already correct
+    for target, content in variants:
+        if not target.exists():
+            tmp = target.with_name(target.name + ".tmp")
+            tmp.write_bytes(content)
+            os.replace(tmp, target)
+    return entry
+
+
+def export(recs: list) -> dict:
+    """Write all shards and the manifest, delete superseded shards; returns the manifest."""
+    indexes, episodes = build_shards(recs)
+    manifest = {
+        "schema": SCHEMA_VERSION,
+        "indexes": {name: write_shard(f"index/{name}", shard) for name, shard in indexes.items()},
+        "aggregates": write_shard("index/aggregates", build_aggregates(recs)),
+        "episodes": {eid: write_shard(f"episodes/{eid}", {"schema": SCHEMA_VERSION, **ep})["path"]
+                     for eid, ep in episodes.items()},
+    }
+
+    tmp = MANIFEST_FILE.with_suffix(".json.tmp")
+    tmp.write_bytes(minify(manifest))
+    os.replace(tmp, MANIFEST_FILE)
+
+    live = ({entry["path"] for entry in manifest["indexes"].values()} | {manifest["aggregates"]["path"]}
+            | set(manifest["episodes"].values()))
+    for subdir in ("index", "episodes"):
+        for path in (DATA_DIR / subdir).glob("*"):
+            name = path.name
+            for suffix in (".gz", ".br"):
+                name = name.removesuffix(suffix)
+            if f"{subdir}/{name}" not in live:
+                path.unlink()
+    return manifest
+
+
+def main():
+    with open(RECS_FILE, "r", encoding="utf-8") as f:
+        recs = json.load(f)
+
+    manifest = export(recs)
+
+    full = minify(recs)
+    first_paint = [MANIFEST_FILE.read_bytes()] + [
+        (DATA_DIR / manifest["indexes"][name]["path"]).read_bytes() for name in ("episodes", "books")
+    ]
+    first_raw = sum(len(b) for b in first_paint)
+    first_gz = sum(len(gzip.compress(b, compresslevel=9)) for b in first_paint)
+
+    print(f"Exported {len(manifest['episodes'])} episodes to {DATA_DIR}/ (schema v{SCHEMA_VERSION})")
+    for name, entry in [*manifest["indexes"].items(), ("aggregates", manifest["aggregates"])]:
+        print(f"  index/{name:<10} {entry['bytes'] / 1024:7.1f} KB  gzip {entry['gzip_bytes'] / 1024:6.1f} KB")
+    print(f"recommendations.json:     {RECS_FILE.stat().st_size / 1024:7.1f} KB "
+          f"(minified {len(full) / 1024:.1f} KB, gzip {len(gzip.compress(full, compresslevel=9)) / 1024:.1f} KB)")
+    print(f"Books page first paint:   {first_raw / 1024:7.1f} KB (gzip {first_gz / 1024:.1f} KB)")
+    if brotli is None:
+        print("brotli not installed: wrote .gz siblings only")
+
+
+if __name__ == "__main__":
+    main()
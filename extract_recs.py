@@ -5,7 +5,9 @@ Extract lightning round recommendations from Lenny's Podcast transcripts.
 Reads .txt transcript files, locates the lightning round section + guest intro/outro,
 sends them to an LLM for structured extraction, and saves results to recommendations.json.
 
-Uses Groq (llama-3.3-70b) as primary, falls back to Google Gemini on rate limits.
+Uses Groq (llama-3.3-70b) as primary and Google Gemini as fallback. Each request is
+routed to whichever provider has headroom; rate limits are honored via retry-after
+hints and backoff, and a provider that keeps failing is taken out of rotation for a while.
 
 Usage:
     pip install groq google-genai
@@ -14,27 +16,431 @@ Usage:
     python3 extract_recs.py
 
 Resumes from where it left off if interrupted (reads existing recommendations.json).
+Each finished episode is appended to recommendations.jsonl as it completes; the log
+is compacted into recommendations.json when the run ends.
+
+Responses are cached in .llm_cache/ keyed by model, prompt version and transcript
+sections, so re-running over unchanged transcripts costs no API calls. Pass --no-cache
+to bypass it.
+
+Run with --sections-only to pre-extract sections from every transcript in parallel
+into .sections_cache.json (keyed by path, mtime and size, including transcripts
+with no lightning round). The LLM stage reads from that cache, so unchanged
+transcripts are never re-read.
+
+Pass --batch-tokens N to pack several episodes into one request of up to ~N tokens;
+episodes missing or malformed in a batched response are retried on their own.
+
+Pass --concurrency N to keep up to N requests in flight at once. Requests are paced
+by a per-provider token-bucket limiter (requests/min and tokens/min), and results are
+still written in transcript order.
+
+Responses are repaired and validated locally (extraction_schema.py): fences, stray
+prose, trailing commas, truncated output and known shape slips are fixed without
+another request, and only the fields that are still invalid (or were cut off) are
+requested again, with just the transcript sections they come from.
+
+Every run writes per-stage timings (read, section detection, LLM call, JSON parse,
+save), per-provider latency histograms, token counts and retry/fallback counts to
+.metrics/ (see metrics.py). Pass --profile to also profile the run with cProfile.
 """
 
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
 import os
+import random
 import re
 import sys
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
 from pathlib import Path
 
 from groq import Groq
 from google import genai
+from google.genai import types
+
+import metrics
+from extraction_schema import (
+    FIELD_SCHEMAS, ExtractionError, field_errors, invalid_fields, merge_fields, normalize_extraction,
+    prune_invalid, repair_json,
+)
+from transcript_index import INDEX_FILE, TranscriptIndex
+from transcripts import (
+    TRANSCRIPTS_DIR, TURN_HEADER_RE, file_signature, find_lightning_round, open_transcript, skip_lines, slice_lines,
+    tail_start,
+)
 
-TRANSCRIPTS_DIR = Path("lennys-podcast-transcripts")
 OUTPUT_FILE = Path("recommendations.json")
+RESULTS_LOG = Path("recommendations.jsonl")  # append-only log of results not yet compacted
 GROQ_MODEL = "llama-3.3-70b-versatile"
 GEMINI_MODEL = "gemini-2.5-flash-lite"
-DELAY_BETWEEN_REQUESTS = 1.0  # seconds
-MAX_SECTION_CHARS = 8000  # truncate long sections to stay under token limits
+PROMPT_VERSION = 1  # bump when EXTRACTION_PROMPT changes to invalidate cached responses
+CACHE_DIR = Path(".llm_cache")
+CACHE_MAX_BYTES = 50 * 1024 * 1024
+SECTIONS_CACHE_FILE = Path(".sections_cache.json")
+SECTIONS_VERSION = 3  # bump when section extraction rules change to invalidate the cache
+
+# Free-tier quotas per provider, used to pace requests instead of a fixed sleep
+GROQ_RPM = 30
+GROQ_TPM = 12000
+GEMINI_RPM = 15
+GEMINI_TPM = 250000
+# Rough characters-per-token for English text with each model's tokenizer
+MODEL_CHARS_PER_TOKEN = {
+    GROQ_MODEL: 3.8,
+    GEMINI_MODEL: 4.0,
+}
+# Largest single request (prompt + transcript sections) we send to each model.
+# Groq counts max_tokens against the 12k TPM too, and rejects bigger requests with 413.
+REQUEST_TOKEN_BUDGET = {
+    GROQ_MODEL: 5500,
+    GEMINI_MODEL: 30000,
+}
+# Share of the section budget each section may use before spare budget is handed
+# out again in the order below, lightning round first
+SECTION_BUDGET_SHARES = {
+    "lightning_round": 0.6,
+    "intro": 0.25,
+    "outro": 0.15,
+}
+MAX_ATTEMPTS = 6  # per request, across all providers
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+BREAKER_THRESHOLD = 3  # consecutive failures before a provider is taken out of rotation
+BREAKER_COOLDOWN = 60.0  # seconds
+TRANSIENT_ERRORS = {"rate_limit", "server", "network"}  # kinds that count against a provider's health
+BATCH_MAX_EPISODES = 8
+BATCH_EPISODE_OVERHEAD_TOKENS = 20  # per-episode header in a batched request
+OUTPUT_TOKENS = 2048  # max_tokens requested per extracted episode
+FOLLOWUP_MAX_TOKENS = 1024  # for a request that re-extracts only some fields
+
+
+class RateLimiter:
+    """Token-bucket limiter for a provider's requests-per-minute and tokens-per-minute quotas.
+
+    Both buckets refill continuously. acquire() blocks until one request and the
+    estimated number of tokens are available, so it is safe to share between threads.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last
+        self._last = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens: int) -> None:
+        # A request bigger than the whole bucket would never fit; let it through when full
+        tokens = min(tokens, self.tpm)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait = max(
+                    (1 - self._requests) * 60 / self.rpm,
+                    (tokens - self._tokens) * 60 / self.tpm,
+                )
+            time.sleep(wait)
+
+    def wait_time(self, tokens: int) -> float:
+        """Seconds until acquire(tokens) could proceed, without taking anything."""
+        tokens = min(tokens, self.tpm)
+        with self._lock:
+            self._refill()
+            return max(
+                0.0,
+                (1 - self._requests) * 60 / self.rpm,
+                (tokens - self._tokens) * 60 / self.tpm,
+            )
+
+
+GROQ_LIMITER = RateLimiter(GROQ_RPM, GROQ_TPM)
+GEMINI_LIMITER = RateLimiter(GEMINI_RPM, GEMINI_TPM)
+
+
+class ProviderError(Exception):
+    """A provider call failed, classified from the SDK exception rather than its message.
+
+    kind is one of:
+      rate_limit  429 / quota exhausted; retry later, ideally after retry_after
+      too_large   413; this provider will never accept the request
+      server      5xx; transient
+      network     no HTTP response (timeout, connection reset); transient
+      client      any other 4xx; retrying won't help
+    """
+
+    def __init__(self, provider: str, kind: str, status: int | None,
+                 retry_after: float | None, cause: Exception):
+        super().__init__(f"{provider} {kind}" + (f" (HTTP {status})" if status else "") + f": {cause}")
+        self.provider = provider
+        self.kind = kind
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_retry_delay(value) -> float | None:
+    """Parse a retry hint: seconds ("7", "0.5"), Go-style durations ("1m2.5s", "850ms")
+    as sent in Groq's x-ratelimit-reset-* headers and Gemini's RetryInfo, or an HTTP date."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        scale = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+        return sum(float(n) * scale[u] for n, u in parts)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(provider: str, e: Exception) -> ProviderError:
+    """Classify an SDK exception by its HTTP status code and retry hints.
+
+    Groq raises APIStatusError with .status_code and the httpx .response; the Gemini
+    SDK raises APIError with .code and the error body in .details.
+    """
+    status = getattr(e, "status_code", None)
+    if not isinstance(status, int):
+        status = getattr(e, "code", None)
+    if not isinstance(status, int):
+        status = None
+
+    retry_after = None
+    headers = getattr(getattr(e, "response", None), "headers", None)
+    if headers is not None:
+        for header in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+            delay = parse_retry_delay(headers.get(header))
+            if delay is not None:
+                retry_after = max(retry_after or 0.0, delay)
+    details = getattr(e, "details", None)
+    if retry_after is None and isinstance(details, dict):
+        for detail in (details.get("error") or {}).get("details") or []:
+            if isinstance(detail, dict) and "retryDelay" in detail:
+                retry_after = parse_retry_delay(detail["retryDelay"])
+
+    if status == 429:
+        kind = "rate_limit"
+    elif status == 413:
+        kind = "too_large"
+    elif status is not None and status >= 500:
+        kind = "server"
+    elif status is not None:
+        kind = "client"
+    else:
+        kind = "network"
+    return ProviderError(provider, kind, status, retry_after, e)
+
+
+class Provider:
+    """One LLM backend plus the router's view of its health.
+
+    send(content, max_tokens) performs the request and returns the raw response text.
+    """
+
+    def __init__(self, name: str, model: str, limiter: RateLimiter, send):
+        self.name = name
+        self.model = model
+        self.limiter = limiter
+        self.send = send
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.breaker_open = False
+        self.stats = {"requests": 0, "successes": 0, "failures": 0, "rate_limited": 0, "breaker_trips": 0}
+
+
+class ProviderRouter:
+    """Routes each request to the provider with the most headroom right now.
+
+    Headroom is the time until a provider could take the request: the later of its
+    cooldown and its rate limiter's wait. Failures are classified structurally:
+    rate limits, server and network errors put the provider on a cooldown of at
+    least the server's retry-after hint, with jittered exponential backoff as
+    failures repeat. BREAKER_THRESHOLD consecutive failures trip the circuit
+    breaker, taking the provider out of rotation for BREAKER_COOLDOWN seconds; the
+    next request after that is a trial that closes it again on success.
+    A 413 rules that provider out for the current request only.
+    """
+
+    def __init__(self, providers: list[Provider]):
+        self.providers = providers
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "fallbacks": 0}
+
+    def _pick(self, tokens: dict[str, int], excluded: set[str]) -> tuple[Provider | None, float]:
+        """Return the provider that could take the request soonest, and how soon."""
+        now = time.monotonic()
+        best, best_wait = None, 0.0
+        # Ties go to the earlier provider in the list (Groq first)
+        for provider in self.providers:
+            if provider.name in excluded:
+                continue
+            wait = max(provider.cooldown_until - now, provider.limiter.wait_time(tokens[provider.name]))
+            if best is None or wait < best_wait:
+                best, best_wait = provider, wait
+        return best, best_wait
+
+    def _record_failure(self, provider: Provider, error: ProviderError) -> None:
+        with self._lock:
+            provider.stats["failures"] += 1
+            if error.kind == "rate_limit":
+                provider.stats["rate_limited"] += 1
+            if error.kind not in TRANSIENT_ERRORS:
+                return  # a 413 or other 4xx is about the request, not the provider's health
+            provider.consecutive_failures += 1
+
+            ceiling = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (provider.consecutive_failures - 1))
+            delay = max(error.retry_after or 0.0, random.uniform(ceiling / 2, ceiling))
+            if provider.breaker_open or provider.consecutive_failures >= BREAKER_THRESHOLD:
+                if not provider.breaker_open:
+                    provider.stats["breaker_trips"] += 1
+                    print(f"  [{provider.name} circuit open for {BREAKER_COOLDOWN}s after "
+                          f"{provider.consecutive_failures} failures]", flush=True)
+                provider.breaker_open = True
+                delay = max(delay, BREAKER_COOLDOWN)
+            provider.cooldown_until = max(provider.cooldown_until, time.monotonic() + delay)
+
+    def _record_success(self, provider: Provider) -> None:
+        with self._lock:
+            provider.stats["successes"] += 1
+            provider.consecutive_failures = 0
+            provider.breaker_open = False
+
+    def request(self, content: str, max_tokens: int = OUTPUT_TOKENS) -> tuple[str, str]:
+        """Send content to the best available provider. Returns (model, raw response text).
+
+        Raises the last ProviderError once every provider has refused the request, a
+        non-retryable error occurs, or MAX_ATTEMPTS attempts have failed.
+        """
+        prompt_tokens = {p.name: estimate_tokens(content, p.model) for p in self.providers}
+        # Quotas are charged for max_tokens up front (Groq counts it against TPM)
+        tokens = {name: count + max_tokens for name, count in prompt_tokens.items()}
+        excluded: set[str] = set()
+        last_error = None
+        with self._lock:
+            self.stats["requests"] += 1
+
+        for attempt in range(MAX_ATTEMPTS):
+            provider, _ = self._pick(tokens, excluded)
+            if provider is None:
+                break
+            with metrics.timer("llm_wait"):
+                cooldown = provider.cooldown_until - time.monotonic()
+                if cooldown > 0:
+                    time.sleep(cooldown)
+                provider.limiter.acquire(tokens[provider.name])
+
+            with self._lock:
+                provider.stats["requests"] += 1
+                if attempt:
+                    self.stats["retries"] += 1
+                    metrics.count("llm.retries")
+                if provider is not self.providers[0]:
+                    self.stats["fallbacks"] += 1
+                    metrics.count("llm.fallbacks")
+            start = time.perf_counter()
+            try:
+                raw = provider.send(content, max_tokens)
+            except Exception as e:
+                error = classify_error(provider.name, e)
+                metrics.observe(f"llm.{provider.name}.failed", time.perf_counter() - start)
+                metrics.count(f"llm.{provider.name}.errors.{error.kind}")
+                self._record_failure(provider, error)
+                if error.kind == "client":
+                    raise error from e
+                if error.kind == "too_large":
+                    excluded.add(provider.name)
+                last_error = error
+                continue
+
+            metrics.observe(f"llm.{provider.name}", time.perf_counter() - start)
+            # Token counts are estimates, from the same chars-per-token ratios the limiter uses
+            metrics.count(f"llm.{provider.name}.prompt_tokens", prompt_tokens[provider.name])
+            metrics.count(f"llm.{provider.name}.completion_tokens", estimate_tokens(raw, provider.model))
+            metrics.count(f"llm.{provider.name}.response_bytes", len(raw.encode("utf-8")))
+            self._record_success(provider)
+            return provider.model, raw
+
+        raise last_error
+
+
+class ResponseCache:
+    """Content-addressed on-disk cache of raw LLM responses, bounded in size with LRU eviction.
+
+    Each entry is one file named by the hash of (model, prompt version, sections).
+    File mtimes double as the LRU clock: a hit touches the file, and when the cache
+    grows past max_bytes the least recently used entries are deleted.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        directory.mkdir(parents=True, exist_ok=True)
+        self._size = sum(p.stat().st_size for p in directory.glob("*.txt"))
+
+    @staticmethod
+    def key(model: str, sections: dict) -> str:
+        payload = json.dumps(
+            [model, PROMPT_VERSION, sections["intro"], sections["lightning_round"], sections["outro"]],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        path = self.directory / f"{key}.txt"
+        try:
+            raw = path.read_text(encoding="utf-8")
+            os.utime(path)
+        except OSError:
+            return None
+        return raw
+
+    def put(self, key: str, raw: str) -> None:
+        path = self.directory / f"{key}.txt"
+        data = raw.encode("utf-8")
+        with self._lock:
+            if path.exists():
+                return
+            tmp = path.with_suffix(f".tmp{threading.get_ident()}")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+            self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        entries = sorted(self.directory.glob("*.txt"), key=lambda p: p.stat().st_mtime)
+        for path in entries:
+            if self._size <= self.max_bytes:
+                break
+            size = path.stat().st_size
+            path.unlink(missing_ok=True)
+            self._size -= size
+
+
+# Set by main(); None disables caching
+RESPONSE_CACHE: ResponseCache | None = None
 
 EXTRACTION_PROMPT = """\
 You are extracting structured data from a Lenny's Podcast transcript.
@@ -83,82 +489,196 @@ Return ONLY valid JSON matching this schema (no markdown fences, no commentary):
 """
 
 
-def find_lightning_round(lines: list[str]) -> str | None:
-    """Find the lightning round section in the transcript.
+BATCH_PROMPT = EXTRACTION_PROMPT + """
+This request contains several episodes, each starting with a "##### EPISODE <n> #####"
+header. Extract each episode independently using the schema above, and return ONLY a
+JSON object of this form (no markdown fences, no commentary):
 
-    Looks for common phrasings Lenny uses to start the lightning round,
-    then captures everything from there to the end-of-lightning-round
-    signals (wrap-up, "where can folks find you", "thank you so much", etc).
-    """
-    start_idx = None
-    # Search for the start of lightning round (various phrasings)
-    for i, line in enumerate(lines):
-        lower = line.lower()
-        if any(phrase in lower for phrase in [
-            "lightning round",
-            "rapid fire",
-            "rapid-fire",
-        ]):
-            # Use the first mention that looks like the actual start
-            # (Lenny sometimes mentions it a few lines before starting)
-            start_idx = i
-            break
+{"results": [{"id": 1, "guests": [...], "lightning_round": {...}}, ...]}
 
-    if start_idx is None:
-        return None
+with exactly one entry per episode, where "id" is the number from that episode's header.
+"""
 
-    # Find the end: look for wrap-up signals after the lightning round starts
-    end_idx = len(lines)
-    for i in range(start_idx + 5, len(lines)):
-        lower = lines[i].lower()
-        if any(phrase in lower for phrase in [
-            "where can folks find you",
-            "where can people find you",
-            "where can listeners find you",
-            "two final questions",
-            "final question. where",
-            "thank you so much for being here",
-            "thanks so much for being here",
-            "thank you for being here",
-            "this was amazing",
-            "this was incredible",
-            "this has been amazing",
-            "this has been incredible",
-            "what a conversation",
-            "bye everyone",
-        ]):
-            # Include a few lines after the signal for context
-            end_idx = min(i + 10, len(lines))
-            break
+FOLLOWUP_PROMPT = """\
+You are extracting structured data from a Lenny's Podcast transcript. Be precise — only
+include information explicitly stated. If a field has no data, use null for scalars or [] for arrays.
+Items are only those actually recommended; "why" is a brief reason or null, and "type" for
+tv_movies is "tv_show" or "movie".
 
-    section = "\n".join(lines[start_idx:end_idx])
-    # Only return if it's substantial enough to be a real lightning round
-    if len(section) < 200:
-        return None
-    return section
+Extract only these fields from the sections below: {fields}.
+
+Return ONLY valid JSON with exactly these keys (no markdown fences, no commentary):
+
+{schema}
+"""
 
 
 def extract_sections(filepath: Path) -> dict | None:
-    """Read a transcript file and extract intro, lightning round, and outro sections."""
-    text = filepath.read_text(encoding="utf-8", errors="replace")
-    lines = text.splitlines()
+    """Read a transcript file and extract intro, lightning round, and outro sections.
 
-    if len(lines) < 10:
-        return None
+    The file is memory-mapped rather than read: the intro is read forward from the
+    start, the outro backward from EOF, and only the located lightning round is
+    decoded, so the rest of a long transcript is never materialized.
+    """
+    with open_transcript(filepath) as buf:
+        # Empty, or fewer than 10 lines: no content after the 9th line break
+        if not buf or skip_lines(buf, 0, 9) >= len(buf):
+            return None
 
-    lightning = find_lightning_round(lines)
-    if lightning is None:
-        return None
+        lightning = find_lightning_round(buf)
+        if lightning is None:
+            return None
 
-    intro = "\n".join(lines[:50])[:MAX_SECTION_CHARS]
-    outro = "\n".join(lines[-50:])[:MAX_SECTION_CHARS]
-    lightning = lightning[:MAX_SECTION_CHARS]
+        intro = slice_lines(buf, 0, skip_lines(buf, 0, 50))
+        outro = slice_lines(buf, tail_start(buf, 50), len(buf))
 
-    return {
+    return fit_sections({
         "intro": intro,
         "lightning_round": lightning,
         "outro": outro,
+    })
+
+
+def section_token_budget() -> int:
+    """Tokens left for transcript sections in a single request, for the tightest provider.
+
+    The prompt, the section headers and the separators build_prompt() adds around
+    the sections all come out of the request budget.
+    """
+    empty = {name: "" for name in SECTION_BUDGET_SHARES}
+    return min(
+        REQUEST_TOKEN_BUDGET[model] - estimate_tokens(build_prompt(empty), model)
+        for model in REQUEST_TOKEN_BUDGET
+    )
+
+
+def allocate_budget(needs: dict, budget: int) -> dict:
+    """Split a token budget across sections, giving the lightning round priority.
+
+    Each section first gets up to its share of the budget; whatever a section
+    doesn't need is then handed out in SECTION_BUDGET_SHARES order.
+    """
+    alloc = {name: min(needs[name], int(budget * share)) for name, share in SECTION_BUDGET_SHARES.items()}
+    spare = budget - sum(alloc.values())
+    for name in SECTION_BUDGET_SHARES:
+        extra = min(spare, needs[name] - alloc[name])
+        alloc[name] += extra
+        spare -= extra
+    return alloc
+
+
+def split_turns(text: str) -> list[str]:
+    """Split text into speaker turns (header line plus what follows), keeping line breaks.
+
+    Falls back to single lines when the text has no recognizable turn headers.
+    """
+    starts = [m.start() for m in TURN_HEADER_RE.finditer(text)]
+    if len(starts) < 2:
+        return text.splitlines(keepends=True)
+    if starts[0] != 0:
+        starts.insert(0, 0)
+    return [text[a:b] for a, b in zip(starts, starts[1:] + [len(text)])]
+
+
+def trim_to_tokens(text: str, max_tokens: int, model: str, from_end: bool = False) -> str:
+    """Trim text to about max_tokens, cutting only between speaker turns.
+
+    Keeps turns from the start (or from the end, for the outro). If even a single
+    turn doesn't fit, it is cut mid-turn instead of dropping the section.
+    """
+    if estimate_tokens(text, model) <= max_tokens:
+        return text
+    # estimate_tokens() rounds up, so leave room for its extra token
+    max_chars = int(max(0, max_tokens - 1) * MODEL_CHARS_PER_TOKEN[model])
+
+    turns = split_turns(text)
+    if from_end:
+        turns.reverse()
+    kept = []
+    used = 0
+    for turn in turns:
+        if used + len(turn) > max_chars:
+            break
+        kept.append(turn)
+        used += len(turn)
+
+    if not kept:
+        return text[-max_chars:] if from_end else text[:max_chars]
+    if from_end:
+        kept.reverse()
+    return "".join(kept).rstrip("\n")
+
+
+def fit_sections(sections: dict, model: str = GROQ_MODEL) -> dict:
+    """Trim sections to the request token budget and record the estimated tokens used."""
+    budget = section_token_budget()
+    needs = {name: estimate_tokens(sections[name], model) for name in SECTION_BUDGET_SHARES}
+    alloc = allocate_budget(needs, budget)
+
+    fitted = {
+        "intro": trim_to_tokens(sections["intro"], alloc["intro"], model),
+        "lightning_round": trim_to_tokens(sections["lightning_round"], alloc["lightning_round"], model),
+        # The outro's useful part ("where can folks find you") is near the end
+        "outro": trim_to_tokens(sections["outro"], alloc["outro"], model, from_end=True),
     }
+    fitted["tokens"] = sum(estimate_tokens(fitted[name], model) for name in SECTION_BUDGET_SHARES)
+    return fitted
+
+
+def load_sections_cache() -> dict:
+    """Load cached sections as {path: {"signature": [mtime_ns, size], "sections": dict | None}}.
+
+    A cache written by a different SECTIONS_VERSION is discarded.
+    """
+    if not SECTIONS_CACHE_FILE.exists():
+        return {}
+    with metrics.timer("read"), open(SECTIONS_CACHE_FILE, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != SECTIONS_VERSION:
+        return {}
+    return data["files"]
+
+
+def save_sections_cache(cache: dict) -> None:
+    tmp = SECTIONS_CACHE_FILE.with_suffix(".json.tmp")
+    with metrics.timer("save"):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": SECTIONS_VERSION, "files": cache}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, SECTIONS_CACHE_FILE)
+
+
+def _extract_entry(filepath: Path) -> tuple[str, dict, float]:
+    # Module-level so ProcessPoolExecutor can pickle it; the worker's own timing is
+    # returned because metrics only live in the parent process
+    start = time.perf_counter()
+    entry = {"signature": file_signature(filepath), "sections": extract_sections(filepath)}
+    return str(filepath), entry, time.perf_counter() - start
+
+
+def refresh_sections_cache(files: list[Path], cache: dict) -> int:
+    """Re-extract sections for transcripts that are new or changed since they were cached.
+
+    Extraction runs in a process pool. Entries for transcripts that no longer exist
+    are dropped. Returns the number of transcripts (re-)extracted.
+    """
+    stale = [fp for fp in files
+             if cache.get(str(fp), {}).get("signature") != file_signature(fp)]
+    if stale:
+        with ProcessPoolExecutor() as pool:
+            for path, entry, seconds in pool.map(_extract_entry, stale, chunksize=8):
+                cache[path] = entry
+                metrics.record("section_detection", seconds)
+
+    current = {str(fp) for fp in files}
+    for path in list(cache):
+        if path not in current:
+            del cache[path]
+    return len(stale)
+
+
+def build_prompt(sections: dict) -> str:
+    """The full single-episode request: EXTRACTION_PROMPT followed by the sections."""
+    return EXTRACTION_PROMPT + "\n\n" + build_user_content(sections)
 
 
 def build_user_content(sections: dict) -> str:
@@ -169,153 +689,516 @@ def build_user_content(sections: dict) -> str:
     )
 
 
-def call_groq(client: Groq, sections: dict) -> dict:
-    """Send transcript sections to Groq and get structured extraction."""
+def estimate_tokens(text: str, model: str = GROQ_MODEL) -> int:
+    return int(len(text) / MODEL_CHARS_PER_TOKEN[model]) + 1
+
+
+def parse_response(raw: str) -> tuple[object, list[str]]:
+    """Parse a model response as JSON, repairing it locally if needed.
+
+    Returns (value, repairs applied); see extraction_schema.repair_json(). Raises
+    json.JSONDecodeError if it is beyond repair.
+    """
+    with metrics.timer("json_parse"):
+        value, repairs = repair_json(raw)
+    for repair in repairs:
+        metrics.count(f"llm.repairs.{repair}")
+    return value, repairs
+
+
+def request_groq(client: Groq, content: str, max_tokens: int = OUTPUT_TOKENS) -> str:
     response = client.chat.completions.create(
         model=GROQ_MODEL,
         messages=[
-            {"role": "user", "content": EXTRACTION_PROMPT + "\n\n" + build_user_content(sections)}
+            {"role": "user", "content": content}
         ],
-        max_tokens=2048,
+        max_tokens=max_tokens,
     )
 
-    raw = response.choices[0].message.content.strip()
-    raw = re.sub(r"^```(?:json)?\s*", "", raw)
-    raw = re.sub(r"\s*```$", "", raw)
-    return json.loads(raw)
+    return response.choices[0].message.content
 
 
-def call_gemini(client: genai.Client, sections: dict) -> dict:
-    """Send transcript sections to Gemini and get structured extraction."""
+def request_gemini(client: genai.Client, content: str, max_tokens: int = OUTPUT_TOKENS) -> str:
     response = client.models.generate_content(
         model=GEMINI_MODEL,
-        contents=EXTRACTION_PROMPT + "\n\n" + build_user_content(sections),
+        contents=content,
+        config=types.GenerateContentConfig(max_output_tokens=max_tokens),
     )
 
-    raw = response.text.strip()
-    raw = re.sub(r"^```(?:json)?\s*", "", raw)
-    raw = re.sub(r"\s*```$", "", raw)
-    return json.loads(raw)
+    return response.text
 
 
-def call_llm(groq_client: Groq, gemini_client: genai.Client | None, sections: dict) -> dict:
-    """Try Groq first, fall back to Gemini on rate limit or request-too-large errors."""
+def lookup_cached(sections: dict) -> dict | None:
+    """Return a cached extraction for these sections from any provider, or None."""
+    if RESPONSE_CACHE is None:
+        return None
+    for model in (GROQ_MODEL, GEMINI_MODEL):
+        raw = RESPONSE_CACHE.get(ResponseCache.key(model, sections))
+        if raw is None:
+            continue
+        try:
+            extracted = parse_response(raw)[0]
+        except json.JSONDecodeError:
+            continue   # a damaged entry is a miss; a new response will replace it
+        metrics.count("llm.cache_hits")
+        return normalize_extraction(extracted)
+    return None
+
+
+def build_followup_content(sections: dict, fields: list[str], extracted: dict) -> str:
+    """A request for just `fields`, with only the sections they are extracted from."""
+    schema = "{\n" + ",\n".join(f'  "{field}": {FIELD_SCHEMAS[field]}' for field in fields) + "\n}"
+    parts = [FOLLOWUP_PROMPT.format(fields=", ".join(fields), schema=schema)]
+    if "guests" in fields:
+        parts.append(f"=== INTRO ===\n{sections['intro']}")
+    elif "guests" not in field_errors(extracted):
+        parts.append("Guests: " + ", ".join(guest["name"] for guest in extracted["guests"]))
+    if any(field != "guests" for field in fields):
+        parts.append(f"=== LIGHTNING ROUND ===\n{sections['lightning_round']}")
+    if "guests" in fields:
+        parts.append(f"=== OUTRO ===\n{sections['outro']}")
+    return "\n\n".join(parts)
+
+
+def complete_extraction(router: ProviderRouter, sections: dict, extracted,
+                        truncated: bool = False) -> tuple[dict, bool]:
+    """Validate a parsed response, re-requesting only the fields that are invalid or were cut off.
+
+    Whatever is still invalid after one follow-up request is dropped (see
+    extraction_schema.prune_invalid()); raises ExtractionError if the guests are.
+    Returns (extraction, complete), where complete is False if anything had to be
+    dropped, e.g. because the follow-up request failed.
+    """
+    extracted = normalize_extraction(extracted if isinstance(extracted, dict) else {})
+    fields = invalid_fields(extracted, truncated)
+    if not fields:
+        return extracted, True
+
+    metrics.count("llm.followups")
+    metrics.count("llm.followup_fields", len(fields))
     try:
-        return call_groq(groq_client, sections)
-    except Exception as e:
-        err = str(e).lower()
-        is_rate_limit = "rate" in err or "429" in err or "413" in err
-        if not is_rate_limit:
-            raise
+        with metrics.timer("llm_call"):
+            _, raw = router.request(build_followup_content(sections, fields, extracted),
+                                    max_tokens=FOLLOWUP_MAX_TOKENS)
+        merged = merge_fields(extracted, parse_response(raw)[0], fields)
+    except (ProviderError, json.JSONDecodeError):
+        merged = []
+    metrics.count("llm.followup_fields_fixed", len(merged))
+    metrics.count("llm.fields_dropped", len(prune_invalid(extracted)))
+    return extracted, len(merged) == len(fields)
+
+
+def call_llm(router: ProviderRouter, sections: dict) -> dict:
+    """Extract one episode through whichever provider the router picks.
+
+    The caller has already looked the sections up in the cache (process_batch()).
+    The response is repaired and validated (complete_extraction()) before it is
+    cached, so a cache hit never needs repairing again. An extraction that lost
+    fields (say the follow-up request hit a 429) is returned but not cached, so
+    the next run asks again.
+    """
+    with metrics.timer("llm_call"):
+        model, raw = router.request(build_prompt(sections))
+    extracted, repairs = parse_response(raw)
+    extracted, complete = complete_extraction(router, sections, extracted, truncated="truncated" in repairs)
+    if RESPONSE_CACHE is not None and complete:
+        RESPONSE_CACHE.put(ResponseCache.key(model, sections), json.dumps(extracted, ensure_ascii=False))
+    return extracted
+
+
+def build_batch_content(batch: list[tuple[str, dict]]) -> str:
+    parts = [BATCH_PROMPT]
+    for n, (_, sections) in enumerate(batch, 1):
+        parts.append(f"##### EPISODE {n} #####\n{build_user_content(sections)}")
+    return "\n\n".join(parts)
+
+
+def batch_token_limit() -> int:
+    """Most a batched request may total, prompt plus max_tokens, for the tightest provider.
 
-        if gemini_client is None:
-            raise
+    That is what a single-episode request totals at most: its REQUEST_TOKEN_BUDGET
+    plus one episode's OUTPUT_TOKENS.
+    """
+    return min(REQUEST_TOKEN_BUDGET.values()) + OUTPUT_TOKENS
 
-        print("GROQ LIMITED, trying Gemini...", end=" ", flush=True)
-        return call_gemini(gemini_client, sections)
+
+def plan_batches(episodes: list[tuple[str, dict]], token_budget: int) -> list[list[tuple[str, dict]]]:
+    """Group consecutive (filename, sections) pairs into batches that fit token_budget.
+
+    A batch also stays within batch_token_limit() once the OUTPUT_TOKENS per
+    episode that call_llm_batch() asks for are added, whatever token_budget says.
+    Order is preserved, so results can still be written in transcript order. An
+    episode that doesn't fit in an empty batch goes into a batch of its own.
+    """
+    limit = batch_token_limit()
+    batches: list[list[tuple[str, dict]]] = []
+    current: list[tuple[str, dict]] = []
+    used = estimate_tokens(BATCH_PROMPT)
+    for filename, sections in episodes:
+        cost = estimate_tokens(build_user_content(sections)) + BATCH_EPISODE_OVERHEAD_TOKENS
+        fits = used + cost <= token_budget and used + cost + OUTPUT_TOKENS * (len(current) + 1) <= limit
+        if current and (not fits or len(current) >= BATCH_MAX_EPISODES):
+            batches.append(current)
+            current = []
+            used = estimate_tokens(BATCH_PROMPT)
+        current.append((filename, sections))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def split_batch_response(raw: str, size: int) -> dict[int, dict]:
+    """Map 1-based episode numbers to their extraction from a batched response.
+
+    Entries with an unknown id, a duplicate id or invalid fields are dropped, and
+    so is the last entry of a truncated response, which may have been cut short;
+    the caller retries just those episodes on their own.
+    """
+    try:
+        parsed, repairs = parse_response(raw)
+    except json.JSONDecodeError:
+        return {}
+    entries = parsed.get("results") if isinstance(parsed, dict) else None
+    if not isinstance(entries, list):
+        return {}
+    if "truncated" in repairs:
+        entries = entries[:-1]
+
+    split: dict[int, dict] = {}
+    seen: set[int] = set()
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            n = int(entry.pop("id", None))
+        except (TypeError, ValueError):
+            continue
+        if n in seen:
+            split.pop(n, None)
+            continue
+        seen.add(n)
+        if 1 <= n <= size and not field_errors(normalize_extraction(entry)):
+            split[n] = entry
+    return split
+
+
+def call_llm_batch(router: ProviderRouter, batch: list[tuple[str, dict]]) -> dict[int, dict]:
+    """Extract several episodes in one request. Returns only the entries that validated.
+
+    Valid entries are cached under each episode's single-request cache key, so later
+    runs hit the cache whether or not they batch.
+    """
+    with metrics.timer("llm_call"):
+        model, raw = router.request(build_batch_content(batch), max_tokens=OUTPUT_TOKENS * len(batch))
+
+    split = split_batch_response(raw, len(batch))
+    if RESPONSE_CACHE is not None:
+        for n, extracted in split.items():
+            key = ResponseCache.key(model, batch[n - 1][1])
+            RESPONSE_CACHE.put(key, json.dumps(extracted, ensure_ascii=False))
+    return split
 
 
 def load_existing_results() -> list[dict]:
-    """Load previously saved results to allow resumption."""
+    """Load previously saved results to allow resumption.
+
+    Combines the compacted recommendations.json with any entries appended to the
+    results log by a run that never reached compaction (e.g. it crashed).
+    """
+    results = []
     if OUTPUT_FILE.exists():
-        with open(OUTPUT_FILE, "r") as f:
-            return json.load(f)
-    return []
+        with metrics.timer("read"), open(OUTPUT_FILE, "r") as f:
+            results = json.load(f)
+
+    if RESULTS_LOG.exists():
+        processed = {r["filename"] for r in results}
+        with metrics.timer("read"), open(RESULTS_LOG, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-append leaves a torn last line; that episode is redone
+                    continue
+                if result["filename"] not in processed:
+                    results.append(result)
+                    processed.add(result["filename"])
+
+    return results
+
+
+def append_result(result: dict) -> None:
+    """Durably append one result to the log. Cost does not depend on how many are already saved."""
+    with metrics.timer("save"), open(RESULTS_LOG, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
 
 
 def save_results(results: list[dict]) -> None:
-    """Write results to JSON file."""
-    with open(OUTPUT_FILE, "w") as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    """Atomically write results to the JSON file.
+
+    Writes to a temporary file and renames it over the old one, so a crash never
+    leaves a truncated recommendations.json behind.
+    """
+    tmp = OUTPUT_FILE.with_suffix(".json.tmp")
+    with metrics.timer("save"):
+        with open(tmp, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, OUTPUT_FILE)
+
+
+def process_batch(router: ProviderRouter, batch: list[tuple[str, dict]]) -> list[tuple[str, dict | str]]:
+    """Extract a batch of (filename, sections) pairs, returning process_file() results in order.
+
+    Each episode is looked up in the cache once. The rest go out as one batched
+    request, and anything missing or malformed in the batched response, or the
+    whole batch if the request fails, is retried on its own.
+    """
+    split: dict[int, dict] = {}
+    uncached = []
+    for n, (_, sections) in enumerate(batch, 1):
+        cached = lookup_cached(sections)
+        if cached is None:
+            uncached.append(n)
+        else:
+            split[n] = cached
+    if len(uncached) > 1:
+        try:
+            sub_split = call_llm_batch(router, [batch[n - 1] for n in uncached])
+        except (ProviderError, json.JSONDecodeError) as e:
+            metrics.count("llm.batch_fallbacks")
+            print(f"  [batch of {len(uncached)} failed ({e}); retrying one episode at a time]", flush=True)
+        else:
+            split.update({uncached[m - 1]: extracted for m, extracted in sub_split.items()})
+            if len(sub_split) < len(uncached):
+                metrics.count("llm.batch_retried_episodes", len(uncached) - len(sub_split))
+                print(f"  [batched response lacked {len(uncached) - len(sub_split)} of {len(uncached)} "
+                      f"episodes; retrying them one at a time]", flush=True)
+
+    outcomes = []
+    for n, (filename, sections) in enumerate(batch, 1):
+        if n in split:
+            outcomes.append(("ok", {"filename": filename, **split[n]}))
+        else:
+            outcomes.append(process_file(router, filename, sections))
+    return outcomes
+
+
+def unmentioned_items(result: dict, index: TranscriptIndex) -> list[str]:
+    """Names of extracted items that never occur in the episode's transcript (possible hallucinations)."""
+    lr = result.get("lightning_round") or {}
+    names = ([book.get("title") for book in lr.get("books") or []]
+             + [movie.get("title") for movie in lr.get("tv_movies") or []]
+             + [product.get("name") for product in lr.get("products") or []])
+    # Guests rarely say the full title, so the part before a subtitle or parenthetical counts too
+    unmentioned = []
+    for name in filter(None, names):
+        short = re.sub(r"^(?:the|a|an)\s+", "", re.split(r"[:(]", name)[0].strip(), flags=re.IGNORECASE)
+        if not any(index.count(variant, result["filename"]) for variant in (name, short) if variant):
+            unmentioned.append(name)
+    return unmentioned
+
+
+def process_file(router: ProviderRouter, filename: str, sections: dict) -> tuple[str, dict | str]:
+    """Extract one transcript's sections. Safe to run from worker threads.
+
+    Returns ("ok", result) or ("error", message).
+    """
+    # Call LLM (routed to Groq or Gemini, whichever has headroom)
+    try:
+        extracted = call_llm(router, sections)
+    except json.JSONDecodeError as e:
+        return "error", f"ERROR (bad JSON: {e})"
+    except ExtractionError as e:
+        return "error", f"ERROR ({e})"
+    except Exception as e:
+        return "error", f"API ERROR ({e})"
+
+    return "ok", {"filename": filename, **extracted}
 
 
 def main():
     parser = argparse.ArgumentParser(description="Extract lightning round recommendations.")
     parser.add_argument("--limit", type=int, default=None,
                         help="Max number of episodes to process (for testing)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Number of LLM requests to keep in flight (default: 1)")
+    parser.add_argument("--batch-tokens", type=int, default=0,
+                        help="Pack several episodes into one request of up to this many "
+                             "estimated tokens (default: one episode per request)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"Always call the API, ignoring cached responses in {CACHE_DIR}/")
+    parser.add_argument("--sections-only", action="store_true",
+                        help=f"Only extract transcript sections into {SECTIONS_CACHE_FILE}, no LLM calls")
+    parser.add_argument("--redo", nargs="+", default=[], metavar="FILENAME",
+                        help="Drop these episodes' existing results and extract them again")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"Profile the run with cProfile (stats saved in {metrics.METRICS_DIR}/)")
     args = parser.parse_args()
 
+    with metrics.run("extract_recs", profile=args.profile):
+        return extract(args)
+
+
+def extract(args: argparse.Namespace) -> dict | None:
+    """Run the extraction described by main()'s arguments; returns a summary."""
+    global RESPONSE_CACHE
+
     if not TRANSCRIPTS_DIR.exists():
         print(f"Error: directory '{TRANSCRIPTS_DIR}' not found.")
         sys.exit(1)
 
+    # Get all transcript files, sorted for deterministic order
+    all_files = sorted(TRANSCRIPTS_DIR.glob("*.txt"))
+    print(f"Found {len(all_files)} transcript files.")
+
+    sections_cache = load_sections_cache()
+    refreshed = refresh_sections_cache(all_files, sections_cache)
+    if refreshed:
+        save_sections_cache(sections_cache)
+    known_skips = sum(1 for entry in sections_cache.values() if entry["sections"] is None)
+    print(f"Sections: {refreshed} extracted, {len(all_files) - refreshed} cached "
+          f"({known_skips} with no lightning round)")
+
+    if args.sections_only:
+        print(f"Sections saved to {SECTIONS_CACHE_FILE}")
+        return
+
     # Check for API keys
     if not os.environ.get("GROQ_API_KEY"):
         print("Error: GROQ_API_KEY environment variable not set.")
         sys.exit(1)
 
-    groq_client = Groq()
+    # The router owns retries and backoff, so the SDK's own retry loop is disabled.
+    # GROQ_BASE_URL (read by the SDK) and GEMINI_BASE_URL point both clients at
+    # fake_llm_server.py for offline runs.
+    groq_client = Groq(max_retries=0)
+    providers = [
+        Provider("groq", GROQ_MODEL, GROQ_LIMITER,
+                 lambda content, max_tokens: request_groq(groq_client, content, max_tokens)),
+    ]
 
-    gemini_client = None
     if os.environ.get("GOOGLE_API_KEY"):
-        gemini_client = genai.Client()
+        gemini_base_url = os.environ.get("GEMINI_BASE_URL")
+        gemini_client = genai.Client(http_options={"base_url": gemini_base_url} if gemini_base_url else None)
+        providers.append(Provider("gemini", GEMINI_MODEL, GEMINI_LIMITER,
+                                  lambda content, max_tokens: request_gemini(gemini_client, content, max_tokens)))
         print("Gemini fallback: enabled")
     else:
         print("Gemini fallback: disabled (no GOOGLE_API_KEY)")
+    router = ProviderRouter(providers)
 
-    # Get all transcript files, sorted for deterministic order
-    all_files = sorted(TRANSCRIPTS_DIR.glob("*.txt"))
-    print(f"Found {len(all_files)} transcript files.")
+    if args.no_cache:
+        print("Response cache: disabled")
+    else:
+        RESPONSE_CACHE = ResponseCache(CACHE_DIR, CACHE_MAX_BYTES)
+        print(f"Response cache: {CACHE_DIR}/")
 
     # Load existing results and build a set of already-processed filenames
     results = load_existing_results()
+    if RESULTS_LOG.exists():
+        # Fold in entries left by an interrupted run before appending new ones
+        save_results(results)
+        RESULTS_LOG.unlink()
+    if args.redo:
+        redo = set(args.redo)
+        results = [r for r in results if r["filename"] not in redo]
+        print(f"Redoing {len(redo)} files.")
     processed = {r["filename"] for r in results}
     print(f"Already processed: {len(processed)} files. Resuming...\n")
 
-    skipped = 0
+    # With a transcript index (transcript_index.py), extracted items are checked against the transcript.
+    # Bring it up to date first (cheap when nothing changed), or new transcripts would have no entry.
+    index = TranscriptIndex(INDEX_FILE, TRANSCRIPTS_DIR) if INDEX_FILE.exists() else None
+    if index:
+        indexed, removed = index.update(all_files)
+        if indexed or removed:
+            print(f"Transcript index: {indexed} transcripts indexed, {removed} removed")
+    unmentioned = 0
+
     errors = 0
     newly_processed = 0
 
-    for i, filepath in enumerate(all_files):
-        filename = filepath.name
-
-        if filename in processed:
-            continue
-
-        print(f"[{i+1}/{len(all_files)}] {filename}...", end=" ", flush=True)
+    # Transcripts without a lightning round are known from the sections cache
+    position = {filepath.name: i for i, filepath in enumerate(all_files)}
+    pending = [(filepath.name, sections_cache[str(filepath)]["sections"]) for filepath in all_files
+               if filepath.name not in processed
+               and sections_cache[str(filepath)]["sections"] is not None]
+    section_tokens = {filename: sections["tokens"] for filename, sections in pending}
+    section_budget = section_token_budget()
+    if args.batch_tokens:
+        batches = plan_batches(pending, args.batch_tokens)
+        print(f"Batching {len(pending)} episodes into {len(batches)} requests\n")
+    else:
+        batches = [[episode] for episode in pending]
 
-        # Extract sections from the transcript
-        sections = extract_sections(filepath)
-        if sections is None:
-            print("SKIP (no lightning round)")
-            skipped += 1
-            continue
+    # Workers run concurrently, but results are consumed in submission order so
+    # recommendations.json keeps the same deterministic order as a sequential run.
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        futures = [pool.submit(process_batch, router, batch)
+                   for batch in batches]
 
-        # Call LLM (Groq primary, Gemini fallback)
         try:
-            extracted = call_llm(groq_client, gemini_client, sections)
-        except json.JSONDecodeError as e:
-            print(f"ERROR (bad JSON: {e})")
-            errors += 1
-            continue
-        except Exception as e:
-            print(f"API ERROR ({e})")
-            errors += 1
-            continue
-
-        # Normalize: if API returned a single guest object, wrap it
-        if "guest" in extracted and "guests" not in extracted:
-            extracted["guests"] = [extracted.pop("guest")]
-
-        result = {"filename": filename, **extracted}
-        results.append(result)
-
-        # Save incrementally after every successful extraction
-        save_results(results)
-        print("OK")
-        newly_processed += 1
-
-        if args.limit and newly_processed >= args.limit:
-            print(f"\nReached limit of {args.limit} episodes.")
-            break
-
-        time.sleep(DELAY_BETWEEN_REQUESTS)
+            limit_reached = False
+            for batch, future in zip(batches, futures):
+                for (filename, _), (status, payload) in zip(batch, future.result()):
+                    print(f"[{position[filename]+1}/{len(all_files)}] {filename}...", end=" ", flush=True)
+
+                    if status == "error":
+                        print(payload)
+                        errors += 1
+                        continue
+
+                    results.append(payload)
+
+                    # Append to the log after every successful extraction; the full
+                    # recommendations.json is only rewritten once, below
+                    append_result(payload)
+                    print(f"OK (~{section_tokens[filename]}/{section_budget} section tokens)")
+                    newly_processed += 1
+                    missing = unmentioned_items(payload, index) if index else []
+                    if missing:
+                        print(f"    ⚠ not found in transcript: {', '.join(missing)}")
+                        unmentioned += len(missing)
+
+                    if args.limit and newly_processed >= args.limit:
+                        print(f"\nReached limit of {args.limit} episodes.")
+                        limit_reached = True
+                        break
+                if limit_reached:
+                    break
+        finally:
+            # Don't start queued work after --limit or Ctrl-C; in-flight requests still finish
+            pool.shutdown(wait=False, cancel_futures=True)
+            if RESULTS_LOG.exists() or args.redo:
+                save_results(results)
+                RESULTS_LOG.unlink(missing_ok=True)
 
     print(f"\nDone! Processed {len(results)} episodes total.")
-    print(f"Skipped (no lightning round): {skipped}")
+    print(f"Skipped (no lightning round): {known_skips}")
     print(f"Errors: {errors}")
+    if index:
+        print(f"Items not found in their transcript: {unmentioned}")
+        index.close()
+    print(f"Retries: {router.stats['retries']}, served by fallback provider: {router.stats['fallbacks']}")
     print(f"Results saved to {OUTPUT_FILE}")
 
+    metrics.count_all("episodes", {"processed": newly_processed, "errors": errors, "skipped": known_skips})
+    metrics.count_all("router", router.stats)
+    for provider in providers:
+        metrics.count_all(f"provider.{provider.name}", provider.stats)
+
+    return {
+        "processed": newly_processed,
+        "errors": errors,
+        "skipped": known_skips,
+        "router": router.stats,
+        "providers": {provider.name: provider.stats for provider in providers},
+    }
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,367 @@
+"""
+The extraction format returned by the LLM in extract_recs.py: validation and local repair.
+
+A model response goes through three steps before it is accepted:
+
+1. repair_json() parses it, fixing what can be fixed without asking again: markdown
+   fences, prose around the JSON, trailing commas, and output cut off at the token
+   limit (the element it was cut off in, string or otherwise, is dropped and the
+   brackets are closed).
+2. normalize_extraction() fixes known shape slips: a single "guest" object instead
+   of a "guests" list, an item given as a bare string, "null" as a string, "TV show"
+   for "tv_show", lightning round fields at the top level. A guest's missing or null
+   titles and reach lists become empty lists.
+3. invalid_fields() names the fields that are still wrong, plus those a truncated
+   response lost. extract_recs.py re-requests only those fields, with only the
+   transcript sections they come from (FIELD_SCHEMAS has each field's schema), and
+   merge_fields() folds the answer in. prune_invalid() drops whatever is still
+   invalid after that.
+
+Fields are "guests", "lightning_round" (when it is missing or not an object) or one
+of the keys of LIGHTNING_FIELDS. Keys the schema doesn't know are kept as they are.
+
+Validation matches the zod schemas the web app parses recommendations.json with
+(web/src/data/schemas.ts), which reject the whole file over one bad episode.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+
+# Lightning round lists: key -> (required text field, optional text fields)
+ITEM_FIELDS = {
+    "books": ("title", ("author", "why")),
+    "tv_movies": ("title", ("type", "why")),
+    "products": ("name", ("why",)),
+}
+SCALAR_FIELDS = ("life_motto", "interview_question", "productivity_tip")
+LIGHTNING_FIELDS = (*ITEM_FIELDS, *SCALAR_FIELDS)
+REACH_FIELDS = ("platforms", "websites", "products")
+MAX_CUTS = 64  # element boundaries tried, from the end, when closing truncated JSON
+
+FIELD_SCHEMAS = {
+    "guests": '[{"name": "string", "titles": ["string"], '
+              '"reach": {"platforms": ["@handle on Twitter", "LinkedIn"], "websites": ["url"], '
+              '"products": ["product name"]}}]',
+    "books": '[{"title": "string", "author": "string|null", "why": "string|null"}]',
+    "tv_movies": '[{"title": "string", "type": "tv_show|movie", "why": "string|null"}]',
+    "products": '[{"name": "string", "why": "string|null"}]',
+    "life_motto": '"string|null"',
+    "interview_question": '"string|null"',
+    "productivity_tip": '"string|null"',
+}
+FIELD_SCHEMAS["lightning_round"] = (
+    "{" + ", ".join(f'"{key}": {FIELD_SCHEMAS[key]}' for key in LIGHTNING_FIELDS) + "}"
+)
+
+TV_TYPES = {"tv": "tv_show", "tv_show": "tv_show", "tv_series": "tv_show", "series": "tv_show", "show": "tv_show",
+            "movie": "movie", "film": "movie"}
+
+
+class ExtractionError(ValueError):
+    """A response whose guests are still invalid after repair and follow-up."""
+
+
+# ── JSON repair ───────────────────────────────────────────────────────────────
+
+def _scan(text: str) -> tuple[str, str, list[tuple[int, str]], bool, bool, bool]:
+    """One pass over JSON text that starts with a bracket.
+
+    Drops trailing commas and stops after the top-level value. Returns (cleaned
+    text, brackets still open at the end, [(offset of a comma in cleaned, brackets
+    open there)], whether the text ends inside a string, whether the value was
+    complete, whether any comma was dropped).
+    """
+    out: list[str] = []
+    stack: list[str] = []
+    cuts: list[tuple[int, str]] = []
+    in_string = escaped = dropped = False
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch in "}]":
+            j = len(out) - 1
+            while j >= 0 and out[j].isspace():
+                j -= 1
+            if j >= 0 and out[j] == ",":
+                del out[j]
+                dropped = True
+            out.append(ch)
+            if stack:
+                stack.pop()
+            if not stack:
+                return "".join(out), "", cuts, False, True, dropped
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+        elif ch == ",":
+            cuts.append((len(out), "".join(stack)))
+        out.append(ch)
+    return "".join(out), "".join(stack), cuts, in_string, False, dropped
+
+
+def _close(body: str, open_brackets: str) -> str:
+    body = body.rstrip()
+    if body.endswith(":"):
+        body += " null"
+    body = body.rstrip(",").rstrip()
+    return body + "".join("}" if c == "{" else "]" for c in reversed(open_brackets))
+
+
+def repair_json(raw: str) -> tuple[object, list[str]]:
+    """Parse a model's JSON output, repairing it locally if needed.
+
+    Returns (value, repairs applied), where repairs name what was fixed:
+    "surrounding_text", "trailing_comma" and "truncated". Raises
+    json.JSONDecodeError if the text can't be repaired.
+    """
+    text = raw.strip()
+    text = re.sub(r"^```(?:json)?\s*", "", text)
+    text = re.sub(r"\s*```$", "", text)
+    try:
+        return json.loads(text), []
+    except json.JSONDecodeError as e:
+        error = e
+
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        raise error
+    cleaned, open_brackets, cuts, in_string, complete, dropped = _scan(text[start:])
+
+    repairs = []
+    if start or (complete and len(cleaned) < len(text) - start):
+        repairs.append("surrounding_text")
+    if dropped:
+        repairs.append("trailing_comma")
+    if complete:
+        candidates = [(cleaned, "")]
+    else:
+        repairs.append("truncated")
+        # Close everything as it stands, else cut back to an earlier element boundary.
+        # A string that was cut off is never closed: "Sap" would pass as a title.
+        candidates = [] if in_string else [(cleaned, open_brackets)]
+        candidates += [(cleaned[:offset], brackets) for offset, brackets in reversed(cuts[-MAX_CUTS:])]
+
+    for body, brackets in candidates:
+        try:
+            return json.loads(_close(body, brackets)), repairs
+        except json.JSONDecodeError:
+            continue
+    raise error
+
+
+# ── Shape normalization ───────────────────────────────────────────────────────
+
+def _text_or_none(value):
+    if isinstance(value, str) and value.strip().lower() in ("", "null", "none", "n/a"):
+        return None
+    return value
+
+
+def _as_list(value):
+    """A missing list as [], a lone string as a one-element list; anything else as is."""
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else value
+
+
+def normalize_extraction(extracted: dict) -> dict:
+    """Fix known shape slips in place (see the module docstring); returns extracted."""
+    if "guest" in extracted and "guests" not in extracted:
+        extracted["guests"] = extracted.pop("guest")
+    guests = extracted.get("guests")
+    if isinstance(guests, (dict, str)):
+        guests = extracted["guests"] = [guests]
+    if isinstance(guests, list):
+        for n, guest in enumerate(guests):
+            if isinstance(guest, str):
+                guest = guests[n] = {"name": guest}
+            if not isinstance(guest, dict):
+                continue
+            guest["titles"] = _as_list(guest.get("titles"))
+            if guest.get("reach") is None:
+                guest["reach"] = {}
+            if isinstance(guest["reach"], dict):
+                for key in REACH_FIELDS:
+                    guest["reach"][key] = _as_list(guest["reach"].get(key))
+
+    if "lightning_round" not in extracted and any(key in extracted for key in LIGHTNING_FIELDS):
+        extracted["lightning_round"] = {key: extracted.pop(key) for key in LIGHTNING_FIELDS if key in extracted}
+    lr = extracted.get("lightning_round")
+    if not isinstance(lr, dict):
+        return extracted
+
+    for key, (name_field, optional) in ITEM_FIELDS.items():
+        items = lr.get(key)
+        if isinstance(items, (dict, str)):
+            items = lr[key] = [items]
+        if not isinstance(items, list):
+            continue
+        for n, item in enumerate(items):
+            if isinstance(item, str):
+                item = items[n] = {name_field: item}
+            if not isinstance(item, dict):
+                continue
+            for field in optional:
+                if field in item:
+                    item[field] = _text_or_none(item[field])
+            if "type" in item and item["type"] is None:
+                del item["type"]   # the web app defaults a missing type to "movie", but rejects null
+            if isinstance(item.get("type"), str):
+                kind = re.sub(r"[\s\-/]+", "_", item["type"].strip().lower())
+                item["type"] = TV_TYPES.get(kind, item["type"])
+    for key in SCALAR_FIELDS:
+        if key in lr:
+            lr[key] = _text_or_none(lr[key])
+    return extracted
+
+
+# ── Validation ────────────────────────────────────────────────────────────────
+
+def _is_text(value) -> bool:
+    return isinstance(value, str) and bool(value.strip())
+
+
+def _is_text_list(value) -> bool:
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+
+def guest_errors(guest) -> list[str]:
+    if not isinstance(guest, dict):
+        return ["not an object"]
+    errors = []
+    if not _is_text(guest.get("name")):
+        errors.append("name")
+    if not _is_text_list(guest.get("titles")):
+        errors.append("titles")
+    reach = guest.get("reach")
+    if not (isinstance(reach, dict) and all(_is_text_list(reach.get(key)) for key in REACH_FIELDS)):
+        errors.append("reach")
+    return errors
+
+
+def item_errors(key: str, item) -> list[str]:
+    if not isinstance(item, dict):
+        return ["not an object"]
+    name_field, optional = ITEM_FIELDS[key]
+    errors = [] if _is_text(item.get(name_field)) else [name_field]
+    errors += [field for field in optional if item.get(field) is not None and not isinstance(item[field], str)]
+    if "type" in item and item["type"] is None:
+        errors.append("type")
+    return errors
+
+
+def field_errors(extracted) -> dict[str, list[str]]:
+    """Map each invalid field to what is wrong with it (an empty dict means valid)."""
+    if not isinstance(extracted, dict):
+        return {"guests": ["response is not an object"], "lightning_round": ["response is not an object"]}
+    errors: dict[str, list[str]] = {}
+
+    guests = extracted.get("guests")
+    if not isinstance(guests, list) or not guests:
+        errors["guests"] = ["missing" if guests is None else "not a non-empty list"]
+    else:
+        problems = [f"[{n}].{problem}" for n, guest in enumerate(guests) for problem in guest_errors(guest)]
+        if problems:
+            errors["guests"] = problems
+
+    lr = extracted.get("lightning_round")
+    if not isinstance(lr, dict):
+        errors["lightning_round"] = ["missing" if lr is None else "not an object"]
+        return errors
+    for key in ITEM_FIELDS:
+        items = lr.get(key)
+        if items is None:
+            continue
+        if not isinstance(items, list):
+            errors[key] = ["not a list"]
+            continue
+        problems = [f"[{n}].{problem}" for n, item in enumerate(items) for problem in item_errors(key, item)]
+        if problems:
+            errors[key] = problems
+    for key in SCALAR_FIELDS:
+        if lr.get(key) is not None and not isinstance(lr[key], str):
+            errors[key] = ["not a string or null"]
+    return errors
+
+
+def invalid_fields(extracted, truncated: bool = False) -> list[str]:
+    """Fields to request again: the invalid ones, and for a truncated response the
+    last field it reached (possibly cut short) and every field after it."""
+    fields = list(field_errors(extracted))
+    if not truncated or not isinstance(extracted, dict):
+        return fields
+
+    if "guests" in extracted and list(extracted)[-1] == "guests" and "guests" not in fields:
+        fields.append("guests")
+    lr = extracted.get("lightning_round")
+    if isinstance(lr, dict):
+        present = [key for key in lr if key in LIGHTNING_FIELDS]
+        suspect = present[-1:] + [key for key in LIGHTNING_FIELDS if key not in lr]
+        fields += [key for key in suspect if key not in fields]
+    return fields
+
+
+# ── Follow-up merging and pruning ─────────────────────────────────────────────
+
+def merge_fields(extracted: dict, answer, fields: list[str]) -> list[str]:
+    """Copy the requested fields from a follow-up answer into extracted.
+
+    The answer should hold just those keys, but one that echoes the whole
+    extraction is accepted too. Only fields that validate are copied; returns the
+    fields that were.
+    """
+    if not isinstance(answer, dict):
+        return []
+    answer = normalize_extraction(answer)   # also moves bare lightning round keys under "lightning_round"
+    errors = field_errors(answer)
+    lr_answer = answer.get("lightning_round") if isinstance(answer.get("lightning_round"), dict) else {}
+
+    merged = []
+    for field in fields:
+        if field in errors:
+            continue
+        if field in ("guests", "lightning_round"):
+            if field not in answer:
+                continue
+            extracted[field] = answer[field]
+        else:
+            if field not in lr_answer:
+                continue
+            if not isinstance(extracted.get("lightning_round"), dict):
+                extracted["lightning_round"] = {}
+            extracted["lightning_round"][field] = lr_answer[field]
+        merged.append(field)
+    return merged
+
+
+def prune_invalid(extracted: dict) -> list[str]:
+    """Drop what is still invalid so the rest of the extraction can be kept.
+
+    Invalid list items are removed, invalid scalars become null and a broken
+    lightning_round becomes {}. Returns the fields that were pruned; raises
+    ExtractionError if the guests are invalid, since an episode needs them.
+    """
+    errors = field_errors(extracted)
+    if "guests" in errors:
+        raise ExtractionError(f"invalid guests: {', '.join(errors['guests'])}")
+    if "lightning_round" in errors:
+        extracted["lightning_round"] = {}
+    lr = extracted["lightning_round"]
+    for key in errors:
+        if key in ITEM_FIELDS:
+            items = lr[key] if isinstance(lr[key], list) else []
+            lr[key] = [item for item in items if not item_errors(key, item)]
+        elif key in SCALAR_FIELDS:
+            lr[key] = None
+    return list(errors)
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the Groq and Gemini chat endpoints used by extract_recs.py.
+
+Serves canned extractions (taken from recommendations.json, matched to the request
+by guest name) with configurable latency, simulated rate limits (429 + Retry-After),
+random server errors and malformed JSON, so the extraction pipeline can be exercised
+and benchmarked without network access or API quota.
+
+Endpoints:
+    POST /openai/v1/chat/completions               (Groq, OpenAI-compatible)
+    POST /v1beta/models/{model}:generateContent    (Gemini)
+
+Run standalone:
+    python3 fake_llm_server.py --port 8765 --latency 0.5 --groq-rpm 30
+    export GROQ_BASE_URL=http://127.0.0.1:8765
+    export GEMINI_BASE_URL=http://127.0.0.1:8765
+    python3 extract_recs.py
+
+bench_extract.py starts it in-process.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+CANNED_FILE = Path("recommendations.json")
+EPISODE_HEADER_RE = re.compile(r"^##### EPISODE (\d+) #####$", re.MULTILINE)
+FOLLOWUP_FIELDS_RE = re.compile(r"^Extract only these fields from the sections below: (.+)\.$", re.MULTILINE)
+FALLBACK_EXTRACTION = {
+    "guests": [{"name": "Unknown Guest", "titles": [], "reach": {"platforms": [], "websites": [], "products": []}}],
+    "lightning_round": {
+        "books": [], "tv_movies": [], "products": [],
+        "life_motto": None, "interview_question": None, "productivity_tip": None,
+    },
+}
+
+
+class FakeLLMServer:
+    """Threaded HTTP server imitating the Groq and Gemini APIs.
+
+    Each provider gets a sliding one-minute request window; requests beyond its rpm
+    are answered with 429 and a Retry-After header. On top of that, error_rate of
+    requests fail with a 429 or 503 at random and malformed_rate return truncated JSON.
+    All randomness comes from one seeded generator, so runs are reproducible.
+    """
+
+    def __init__(self, port: int = 0, latency: float = 0.5, jitter: float = 0.2,
+                 groq_rpm: int = 0, gemini_rpm: int = 0, error_rate: float = 0.0,
+                 malformed_rate: float = 0.0, seed: int = 0, canned_file: Path = CANNED_FILE):
+        self.latency = latency
+        self.jitter = jitter
+        self.rpm = {"groq": groq_rpm, "gemini": gemini_rpm}
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.canned = load_canned(canned_file)
+        self.stats = {"groq": 0, "gemini": 0, "rate_limited": 0, "errors": 0, "malformed": 0}
+        self._windows = {"groq": deque(), "gemini": deque()}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    # ── Behaviour ──────────────────────────────────────────────────────────────
+
+    def decide(self, provider: str) -> tuple[str, float, float]:
+        """Pick the outcome of one request: ("ok" | "rate_limit" | "error" | "malformed", delay, retry_after)."""
+        with self._lock:
+            self.stats[provider] += 1
+            delay = max(0.0, self._rng.gauss(self.latency, self.jitter))
+
+            rpm = self.rpm[provider]
+            if rpm:
+                window = self._windows[provider]
+                now = time.monotonic()
+                while window and now - window[0] >= 60:
+                    window.popleft()
+                if len(window) >= rpm:
+                    self.stats["rate_limited"] += 1
+                    return "rate_limit", 0.0, 60 - (now - window[0])
+                window.append(now)
+
+            roll = self._rng.random()
+            if roll < self.error_rate:
+                if self._rng.random() < 0.5:
+                    self.stats["rate_limited"] += 1
+                    return "rate_limit", 0.0, 1.0
+                self.stats["errors"] += 1
+                return "error", delay, 0.0
+            if roll < self.error_rate + self.malformed_rate:
+                self.stats["malformed"] += 1
+                return "malformed", delay, 0.0
+            return "ok", delay, 0.0
+
+    def answer(self, content: str) -> str:
+        """Build the model's reply text for a single, batched or follow-up extraction prompt."""
+        followup = FOLLOWUP_FIELDS_RE.search(content)
+        if followup:
+            extraction = self.match(content)
+            lr = extraction.get("lightning_round") or {}
+            fields = [field.strip() for field in followup.group(1).split(",")]
+            return json.dumps({field: extraction[field] if field in extraction else lr.get(field)
+                               for field in fields}, ensure_ascii=False)
+
+        headers = list(EPISODE_HEADER_RE.finditer(content))
+        if not headers:
+            return json.dumps(self.match(content), ensure_ascii=False)
+
+        results = []
+        for m, nxt in zip(headers, headers[1:] + [None]):
+            part = content[m.end():nxt.start() if nxt else len(content)]
+            results.append({"id": int(m.group(1)), **self.match(part)})
+        return json.dumps({"results": results}, ensure_ascii=False)
+
+    def match(self, content: str) -> dict:
+        """Return the canned extraction whose guest is named in the episode's intro."""
+        intro = content.split("=== LIGHTNING ROUND ===", 1)[0].lower()
+        for name, extraction in self.canned:
+            if name in intro:
+                return extraction
+        return FALLBACK_EXTRACTION
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # keep benchmark output clean
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path.endswith("/chat/completions"):
+                    provider = "groq"
+                    content = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+                elif ":generateContent" in self.path:
+                    provider = "gemini"
+                    content = "\n".join(
+                        part.get("text", "")
+                        for item in body.get("contents", [])
+                        for part in item.get("parts", [])
+                    )
+                else:
+                    self.send_json(404, {"error": {"message": f"unknown endpoint {self.path}"}})
+                    return
+
+                outcome, delay, retry_after = server.decide(provider)
+                time.sleep(delay)
+
+                if outcome == "rate_limit":
+                    self.send_error_json(provider, 429, "Rate limit reached", retry_after)
+                    return
+                if outcome == "error":
+                    self.send_error_json(provider, 503, "Service unavailable", None)
+                    return
+
+                text = server.answer(content)
+                if outcome == "malformed":
+                    text = text[:len(text) // 2]
+                self.send_json(200, completion_body(provider, body.get("model", ""), text))
+
+            def send_error_json(self, provider: str, status: int, message: str, retry_after):
+                if provider == "groq":
+                    payload = {"error": {"message": message, "type": "rate_limit_exceeded" if status == 429 else "server_error"}}
+                else:
+                    payload = {"error": {
+                        "code": status,
+                        "message": message,
+                        "status": "RESOURCE_EXHAUSTED" if status == 429 else "UNAVAILABLE",
+                        "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo",
+                                     "retryDelay": f"{retry_after:.3f}s"}] if retry_after else [],
+                    }}
+                headers = {"Retry-After": f"{retry_after:.3f}"} if retry_after else {}
+                self.send_json(status, payload, headers)
+
+            def send_json(self, status: int, payload: dict, headers: dict | None = None):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def completion_body(provider: str, model: str, text: str) -> dict:
+    """Wrap reply text in the provider's response envelope."""
+    if provider == "groq":
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": 0, "totalTokenCount": 0},
+    }
+
+
+def load_canned(path: Path) -> list[tuple[str, dict]]:
+    """Load (lowercased guest name, extraction) pairs from a recommendations.json file."""
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        episodes = json.load(f)
+
+    canned = []
+    for ep in episodes:
+        extraction = {"guests": ep.get("guests") or [], "lightning_round": ep.get("lightning_round") or {}}
+        for guest in extraction["guests"]:
+            if guest.get("name"):
+                canned.append((guest["name"].lower(), extraction))
+    # Longest names first, so "Elena Verna" doesn't shadow a longer, more specific name
+    canned.sort(key=lambda pair: -len(pair[0]))
+    return canned
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an offline Groq/Gemini stand-in server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Std deviation of the latency")
+    parser.add_argument("--groq-rpm", type=int, default=0, help="Simulated Groq requests/min quota (0 = unlimited)")
+    parser.add_argument("--gemini-rpm", type=int, default=0, help="Simulated Gemini requests/min quota (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 429/503")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of responses with truncated JSON")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(
+        port=args.port, latency=args.latency, jitter=args.jitter,
+        groq_rpm=args.groq_rpm, gemini_rpm=args.gemini_rpm,
+        error_rate=args.error_rate, malformed_rate=args.malformed_rate, seed=args.seed,
+    )
+    print(f"Fake LLM server listening on {server.url} ({len(server.canned)} canned guests)")
+    print(f"  export GROQ_BASE_URL={server.url}")
+    print(f"  export GEMINI_BASE_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"\nRequests served: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""
+Shared HTTP client for the scraping scripts (add_item_urls.py, add_substack_urls.py).
+
+PageFetcher issues GETs over pooled keep-alive connections, spaces out requests per
+host and retries transient failures. With an HttpCache attached it also:
+
+- asks for gzip (Accept-Encoding) and streams bodies gzip-compressed to disk,
+- revalidates cached pages with If-None-Match / If-Modified-Since, so unchanged
+  pages come back as a body-less 304,
+- can run offline, serving everything from the cache and never touching the network
+  (handy for iterating on HTML parsing).
+
+fetch_chunks() yields a page's body in chunks as they arrive, so callers can parse
+while it downloads; fetch_bytes() returns the whole body.
+
+Each request's latency is recorded per host in the current metrics run (metrics.py).
+"""
+
+import gzip
+import hashlib
+import http.client
+import json
+import os
+import threading
+import time
+import zlib
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Iterator, List, Optional, Dict, Tuple
+from urllib.parse import urljoin, urlsplit, SplitResult
+
+import metrics
+
+CACHE_DIR = Path(".http_cache")
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+    'Accept-Encoding': 'gzip',
+}
+FETCH_TIMEOUT = 10
+FETCH_ATTEMPTS = 4
+FETCH_BACKOFF_SECONDS = 1.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+MAX_REDIRECTS = 5
+CHUNK_SIZE = 64 * 1024
+
+
+class FetchError(Exception):
+    """A page could not be fetched, even after retrying."""
+
+
+# ── Disk cache ─────────────────────────────────────────────────────────────────
+
+class HttpCache:
+    """On-disk cache of response bodies and their validators, keyed by request URL.
+
+    Each URL maps to `<hash>.gz`, the body gzip-compressed (kept exactly as received
+    when the server already gzipped it), and `<hash>.json` with its ETag and
+    Last-Modified. Both are written tmp + os.replace, metadata last, so an
+    interrupted run never leaves metadata pointing at a partial body.
+    """
+
+    def __init__(self, directory: Path = CACHE_DIR):
+        self.directory = directory
+        directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Return the cached metadata for `url`, or None if there is no complete entry."""
+        key = self.key(url)
+        try:
+            with open(self.directory / f"{key}.json", 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not (self.directory / f"{key}.gz").exists():
+            return None
+        return meta
+
+    def iter_body(self, url: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield the cached body of `url`, decompressed, in chunks."""
+        with gzip.open(self.directory / f"{self.key(url)}.gz", 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def writer(self, url: str, etag: Optional[str], last_modified: Optional[str],
+               gzipped: bool) -> 'CacheWriter':
+        """Start writing a new body for `url` as it streams in (see CacheWriter)."""
+        return CacheWriter(self, url, etag, last_modified, gzipped)
+
+    def _write(self, path: Path, data: bytes) -> None:
+        tmp = path.with_suffix(f".tmp{threading.get_ident()}")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+
+class CacheWriter:
+    """Streams one response body into the cache: chunks go gzip-compressed to a temp
+    file, and commit() moves it into place and writes the metadata after it.
+
+    Bodies the server sent gzipped are stored exactly as received. abort() throws
+    the partial body away, leaving any previous entry untouched.
+    """
+
+    def __init__(self, cache: HttpCache, url: str, etag: Optional[str], last_modified: Optional[str],
+                 gzipped: bool):
+        self.cache = cache
+        self.url = url
+        self.meta = {'url': url, 'etag': etag, 'last_modified': last_modified}
+        self.path = cache.directory / f"{cache.key(url)}.gz"
+        self.tmp = self.path.with_suffix(f".tmp{threading.get_ident()}")
+        self._file = open(self.tmp, 'wb')
+        self._deflate = None if gzipped else zlib.compressobj(9, zlib.DEFLATED, 31)
+
+    def write(self, chunk: bytes) -> None:
+        """Add a chunk of the body as received from the server."""
+        self._file.write(self._deflate.compress(chunk) if self._deflate else chunk)
+
+    def commit(self) -> None:
+        if self._deflate:
+            self._file.write(self._deflate.flush())
+        self._file.close()
+        os.replace(self.tmp, self.path)
+        meta = {**self.meta, 'fetched_at': time.time()}
+        self.cache._write(self.cache.directory / f"{self.cache.key(self.url)}.json", json.dumps(meta).encode('utf-8'))
+
+    def abort(self) -> None:
+        self._file.close()
+        self.tmp.unlink(missing_ok=True)
+
+
+# ── Fetch ──────────────────────────────────────────────────────────────────────
+
+class HostLimiter:
+    """Spaces out the start of requests to each host by at least `interval` seconds.
+
+    Callers reserve the next free slot under the lock and sleep outside it, so
+    workers hitting different hosts never wait on each other.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host: str) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class PageFetcher:
+    """Thread-safe GET client that reuses keep-alive connections per host.
+
+    Idle connections wait in a per-host pool, so each worker holds at most one at a
+    time and repeat visits to a host skip the TCP/TLS handshake. Connection errors,
+    429s and 5xx responses are retried with exponential backoff (honouring
+    Retry-After); other HTTP errors fail straight away.
+
+    With a cache, known URLs are revalidated and a 304 is answered from disk; with
+    offline=True the cache is the only source and a miss raises FetchError.
+    """
+
+    def __init__(self, limiter: HostLimiter, cache: Optional[HttpCache] = None, offline: bool = False,
+                 timeout: float = FETCH_TIMEOUT, attempts: int = FETCH_ATTEMPTS):
+        if offline and cache is None:
+            raise ValueError("offline mode needs a cache")
+        self.limiter = limiter
+        self.cache = cache
+        self.offline = offline
+        self.timeout = timeout
+        self.attempts = attempts
+        self.stats = {'requests': 0, 'connections': 0, 'retries': 0,
+                      'not_modified': 0, 'offline_hits': 0, 'bytes_received': 0}
+        self._idle: Dict[Tuple[str, str], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, url: str) -> str:
+        """Return the body of `url` decoded as UTF-8. Raises FetchError."""
+        return self.fetch_bytes(url).decode('utf-8', errors='replace')
+
+    def fetch_bytes(self, url: str) -> bytes:
+        """Return the raw (decompressed) body of `url`, following redirects. Raises FetchError."""
+        return b"".join(self.fetch_chunks(url))
+
+    def fetch_chunks(self, url: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield the raw (decompressed) body of `url` in chunks as it downloads. Raises FetchError.
+
+        Failures before the body starts are retried; one partway through the body
+        raises FetchError straight away, since the caller has already consumed part
+        of it. A 200 is written to the cache as it streams, and only kept if the
+        whole body arrives.
+        """
+        cached = self.cache.get(url) if self.cache else None
+        if self.offline:
+            if cached is None:
+                raise FetchError(f"not in cache (offline): {url}")
+            self._count('offline_hits')
+            yield from self.cache.iter_body(url, chunk_size)
+            return
+
+        headers = dict(HEADERS)
+        if cached and cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached and cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+        error = ""
+        for attempt in range(self.attempts):
+            start = time.perf_counter()
+            try:
+                status, resp_headers, opened = self._open(url, headers)
+            except (OSError, EOFError, http.client.HTTPException) as e:
+                error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+                delay = FETCH_BACKOFF_SECONDS * 2 ** attempt
+            else:
+                if status == 304 and cached:
+                    self._count('not_modified')
+                    yield from self.cache.iter_body(url, chunk_size)
+                    return
+                if status == 200:
+                    yield from self._stream(url, resp_headers, *opened, chunk_size)
+                    metrics.observe(f"http.{urlsplit(url).netloc}", time.perf_counter() - start)
+                    return
+                error = f"HTTP {status}"
+                if status not in RETRY_STATUSES:
+                    break
+                delay = parse_retry_after(resp_headers.get('Retry-After'))
+                if delay is None:
+                    delay = FETCH_BACKOFF_SECONDS * 2 ** attempt
+            if attempt + 1 < self.attempts:
+                self._count('retries')
+                time.sleep(delay)
+        raise FetchError(error)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def _stream(self, url: str, headers: http.client.HTTPMessage, key: Tuple[str, str],
+                conn: http.client.HTTPConnection, resp: http.client.HTTPResponse,
+                chunk_size: int) -> Iterator[bytes]:
+        """Yield a 200 body as it is read, decompressing it and writing it to the cache."""
+        gzipped = (headers.get('Content-Encoding') or '').strip().lower() == 'gzip'
+        inflate = zlib.decompressobj(wbits=31) if gzipped else None
+        writer = self.cache.writer(url, headers.get('ETag'), headers.get('Last-Modified'), gzipped) \
+            if self.cache else None
+        finished = False
+        try:
+            while True:
+                try:
+                    chunk = resp.read(chunk_size)
+                    data = inflate.decompress(chunk) if inflate and chunk else chunk
+                except (OSError, http.client.HTTPException, zlib.error) as e:
+                    raise FetchError(f"{type(e).__name__} partway through the body: {e}") from e
+                if not chunk:
+                    break
+                self._count('bytes_received', len(chunk))
+                if writer:
+                    writer.write(chunk)
+                if data:
+                    yield data
+            if inflate:
+                tail = inflate.flush()
+                if tail:
+                    yield tail
+            if writer:
+                writer.commit()
+                writer = None
+            finished = True
+        finally:
+            if writer:
+                writer.abort()
+            # A connection is only reusable once its response has been read to the end
+            if finished and not resp.will_close:
+                self._checkin(key, conn)
+            else:
+                conn.close()
+
+    def _count(self, stat: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[stat] += amount
+
+    def _open(self, url: str, headers: Dict[str, str]) -> Tuple[int, http.client.HTTPMessage, tuple]:
+        """GET `url`, following redirects. Returns (status, headers, (key, conn, response)).
+
+        The response is left unread for a 200; any other final status has its body
+        read and the connection released already, and the last element is ().
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            self.limiter.wait(parts.netloc)
+            key, conn, resp = self._send(parts, headers)
+            location = resp.headers.get('Location')
+            if resp.status == 200:
+                return resp.status, resp.headers, (key, conn, resp)
+            self._finish(key, conn, resp)
+            if resp.status in REDIRECT_STATUSES and location:
+                url = urljoin(url, location)
+                continue
+            return resp.status, resp.headers, ()
+        raise FetchError(f"too many redirects ({url})")
+
+    def _send(self, parts: SplitResult,
+              headers: Dict[str, str]) -> Tuple[Tuple[str, str], http.client.HTTPConnection, http.client.HTTPResponse]:
+        """Send the request and read the response headers; the body is left to the caller."""
+        key = (parts.scheme, parts.netloc)
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        while True:
+            conn, reused = self._checkout(key)
+            try:
+                conn.request('GET', path, headers=headers)
+                resp = conn.getresponse()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                if reused:
+                    continue  # the server dropped an idle keep-alive connection; retry on a fresh one
+                raise
+            self._count('requests')
+            return key, conn, resp
+
+    def _finish(self, key: Tuple[str, str], conn: http.client.HTTPConnection,
+                resp: http.client.HTTPResponse) -> None:
+        """Read a (small) non-200 body to the end and release the connection."""
+        try:
+            body = resp.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            raise
+        self._count('bytes_received', len(body))
+        if resp.will_close:
+            conn.close()
+        else:
+            self._checkin(key, conn)
+
+    def _checkout(self, key: Tuple[str, str]) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            pool = self._idle.get(key)
+            if pool:
+                return pool.pop(), True
+            self.stats['connections'] += 1
+        scheme, netloc = key
+        conn_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return conn_class(netloc, timeout=self.timeout), False
+
+    def _checkin(self, key: Tuple[str, str], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            self._idle.setdefault(key, []).append(conn)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Link every recommended item in recommendations.json to where it's said in the episode.
+
+For each episode, the names of all its books, TV shows/movies and products (plus a
+few normalized variants of each) go into one Aho-Corasick automaton over words. The
+episode's lightning round, located as in extract_recs.py and mapped to speaker turns
+through the turn store (transcripts.py), is then scanned once, turn by turn, and
+each item gets the timestamp and speaker of the turn where a guest first says it, or
+where the host does if no guest says it:
+
+    "mention": {"timestamp": "01:11:42", "speaker": "Ada Chen Rekhi"}
+
+Items never said in the lightning round get "mention": null. Words are tokenized
+the same way as transcript_index.py, so "High-Output Management" in a transcript
+matches "High Output Management" in recommendations.json.
+
+Run: python3 link_timestamps.py
+"""
+
+import json
+import os
+import re
+import time
+from collections import deque
+from pathlib import Path
+
+from transcript_index import TOKEN_RE
+from transcripts import TRANSCRIPTS_DIR, TurnStore, load_turns, locate_lightning_round, open_transcript
+
+RECS_FILE = Path("recommendations.json")
+HOST = "Lenny"
+# Category -> field holding the item's name
+ITEM_FIELDS = {"books": "title", "tv_movies": "title", "products": "name"}
+ARTICLES = {b"the", b"a", b"an"}
+
+
+class WordAutomaton:
+    """Aho-Corasick automaton over word sequences.
+
+    States are ints; goto[state] maps a word to the next state, fail[state] is the
+    longest proper suffix state, and out[state] lists the values of every pattern
+    ending there (its own and those inherited through fail links).
+    """
+
+    def __init__(self):
+        self.goto: list[dict[bytes, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.out: list[list] = [[]]
+
+    def add(self, words: tuple[bytes, ...], value) -> None:
+        state = 0
+        for word in words:
+            nxt = self.goto[state].get(word)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][word] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            state = nxt
+        self.out[state].append(value)
+
+    def build(self) -> "WordAutomaton":
+        """Compute fail links breadth-first; call once after the last add()."""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and word not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(word, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+        return self
+
+    def scan(self, words: list[bytes]):
+        """Yield (index of the last word, value) for every pattern occurrence."""
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, word in enumerate(words):
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            for value in out[state]:
+                yield i, value
+
+
+def words_of(text: str) -> tuple[bytes, ...]:
+    return tuple(TOKEN_RE.findall(text.encode("utf-8").lower()))
+
+
+def name_variants(name: str, canonical_id: str | None = None) -> set[tuple[bytes, ...]]:
+    """Word sequences a guest might say for an item, leading articles dropped.
+
+    The full name, the part before a subtitle or parenthetical ("Dune: Part Two" ->
+    "Dune") and the dedupe canonical id.
+    """
+    variants = set()
+    for text in (name, re.split(r"[:(]", name)[0], canonical_id or ""):
+        words = words_of(text)
+        while words and words[0] in ARTICLES:
+            words = words[1:]
+        if words:
+            variants.add(words)
+    return variants
+
+
+def lightning_round_turns(store: TurnStore, filename: str, directory: Path = TRANSCRIPTS_DIR) -> range:
+    with open_transcript(directory / filename) as buf:
+        located = locate_lightning_round(buf) if buf else None
+    if located is None:
+        return range(0)
+    return store.section(filename, located["start"], located["end"])
+
+
+def link_episode(episode: dict, store: TurnStore) -> int:
+    """Set "mention" on each of the episode's items; returns the number that were found."""
+    lr = episode.get("lightning_round") or {}
+    items = [item for category, field in ITEM_FIELDS.items()
+             for item in lr.get(category) or [] if item.get(field)]
+    if not items:
+        return 0
+
+    automaton = WordAutomaton()
+    for n, item in enumerate(items):
+        name = item.get("title") or item.get("name")
+        for variant in name_variants(name, item.get("canonical_id")):
+            automaton.add(variant, n)
+    automaton.build()
+
+    guest_turn = {}   # item -> first turn a guest says it in
+    any_turn = {}     # item -> first turn anyone says it in
+    if episode["filename"] in store.files:
+        for turn in lightning_round_turns(store, episode["filename"]):
+            is_guest = store.speaker(turn) != HOST
+            for _, n in automaton.scan(TOKEN_RE.findall(store.text_bytes(turn).lower())):
+                any_turn.setdefault(n, turn)
+                if is_guest:
+                    guest_turn.setdefault(n, turn)
+
+    found = 0
+    for n, item in enumerate(items):
+        turn = guest_turn.get(n, any_turn.get(n))
+        if turn is None:
+            item["mention"] = None
+        else:
+            item["mention"] = {"timestamp": store.timestamp(turn), "speaker": store.speaker(turn)}
+            found += 1
+    return found
+
+
+def link_all(recs: list, store: TurnStore) -> tuple[int, int]:
+    """Link every episode's items; returns (items found, items total)."""
+    found = total = 0
+    for episode in recs:
+        found += link_episode(episode, store)
+        lr = episode.get("lightning_round") or {}
+        total += sum(1 for category, field in ITEM_FIELDS.items() for item in lr.get(category) or [] if item.get(field))
+    return found, total
+
+
+def main():
+    with open(RECS_FILE, "r", encoding="utf-8") as f:
+        recs = json.load(f)
+    before = json.dumps(recs, sort_keys=True)
+
+    start = time.perf_counter()
+    with load_turns() as store:
+        found, total = link_all(recs, store)
+    elapsed = time.perf_counter() - start
+    print(f"Linked {found}/{total} items to a lightning round mention in {len(recs)} episodes ({elapsed:.2f}s)")
+
+    if json.dumps(recs, sort_keys=True) == before:
+        print("recommendations.json unchanged")
+        return
+    tmp = RECS_FILE.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(recs, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, RECS_FILE)
+    print(f"Saved mentions to {RECS_FILE}")
+
+
+if __name__ == "__main__":
+    main()
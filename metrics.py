@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Per-run metrics for extract_recs.py, add_substack_urls.py and add_item_urls.py.
+
+Each script wraps its run in metrics.run(), and its hot paths report to the current
+run through the module-level helpers:
+
+    with metrics.timer("fetch"):          # per-stage wall time
+        ...
+    metrics.observe("llm.groq", seconds)  # latency histogram
+    metrics.count("llm.retries")          # counter
+
+When the run ends, everything is written as one JSON file to .metrics/, named after
+the script and the start time:
+
+    {"script": "add_item_urls", "started_at": ..., "elapsed": 12.3, "argv": [...],
+     "timers": {"fetch": {"count": 290, "total": 40.1, "p50": 0.12, "p95": 0.4, ...}},
+     "histograms": {...}, "counters": {"http.bytes_received": 41234567, ...}}
+
+Timers and histograms keep every sample, so percentiles are exact, plus counts per
+latency bucket. The helpers are thread-safe and do nothing outside a run, so the
+instrumented functions can still be imported and called on their own.
+
+With --profile (or METRICS_PROFILE=1, e.g. under pipeline.py) the run is also
+profiled with cProfile: the raw stats go next to the metrics file as .prof, and the
+top functions by cumulative time are included in the JSON. cProfile only sees the
+thread that started the run, which is where parsing, matching and saving happen.
+
+Compare the last two runs of a script to spot regressions:
+
+    python3 metrics.py add_item_urls
+"""
+
+from __future__ import annotations
+
+import argparse
+import cProfile
+import io
+import json
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+METRICS_DIR = Path(".metrics")
+PROFILE_ENV = "METRICS_PROFILE"
+PROFILE_TOP = 25
+# Upper bounds (seconds) of the latency buckets; the last bucket is unbounded
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile, q in [0, 100]; 0.0 for no values."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Histogram:
+    """Samples of one latency (or size) plus their distribution over LATENCY_BUCKETS."""
+
+    def __init__(self):
+        self.samples: list[float] = []
+
+    def add(self, value: float) -> None:
+        self.samples.append(value)
+
+    def percentile(self, q: float) -> float:
+        return percentile(self.samples, q)
+
+    def to_dict(self) -> dict:
+        samples = self.samples
+        buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        for value in samples:
+            buckets[next((i for i, bound in enumerate(LATENCY_BUCKETS) if value <= bound), len(LATENCY_BUCKETS))] += 1
+        total = sum(samples)
+        return {
+            "count": len(samples),
+            "total": round(total, 6),
+            "mean": round(total / len(samples), 6) if samples else 0.0,
+            "min": round(min(samples, default=0.0), 6),
+            "p50": round(self.percentile(50), 6),
+            "p95": round(self.percentile(95), 6),
+            "max": round(max(samples, default=0.0), 6),
+            "buckets": {f"le_{bound}": n for bound, n in zip(LATENCY_BUCKETS, buckets)} | {"inf": buckets[-1]},
+        }
+
+
+class Metrics:
+    """Timers, histograms and counters for one run of a script."""
+
+    def __init__(self, script: str):
+        self.script = script
+        self.argv = sys.argv[1:]
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.elapsed: float | None = None
+        self.timers: dict[str, Histogram] = {}
+        self.histograms: dict[str, Histogram] = {}
+        self.counters: dict[str, float] = {}
+        self.profile: list[dict] | None = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Add one timing of `stage` measured elsewhere (e.g. in a worker process)."""
+        with self._lock:
+            self.timers.setdefault(stage, Histogram()).add(seconds)
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            self.histograms.setdefault(name, Histogram()).add(value)
+
+    def count(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def count_all(self, prefix: str, stats: dict) -> None:
+        """Add a stats dict like PageFetcher.stats as counters named <prefix>.<key>."""
+        for key, value in stats.items():
+            self.count(f"{prefix}.{key}", value)
+
+    def finish(self) -> None:
+        self.elapsed = time.perf_counter() - self._start
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "script": self.script,
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started_at)),
+                "elapsed": round(self.elapsed if self.elapsed is not None else time.perf_counter() - self._start, 6),
+                "argv": self.argv,
+                "timers": {stage: h.to_dict() for stage, h in sorted(self.timers.items())},
+                "histograms": {name: h.to_dict() for name, h in sorted(self.histograms.items())},
+                "counters": dict(sorted(self.counters.items())),
+                **({"profile": self.profile} if self.profile is not None else {}),
+            }
+
+    def path(self, directory: Path = METRICS_DIR) -> Path:
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at))
+        millis = int(self.started_at * 1000) % 1000
+        return directory / f"{self.script}-{stamp}.{millis:03d}.json"
+
+    def write(self, directory: Path = METRICS_DIR) -> Path:
+        path = self.path(directory)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp, path)
+        return path
+
+    def report(self) -> str:
+        """Per-stage timings, slowest first, as printable lines."""
+        lines = [f"{'stage':<22}{'count':>7}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}"]
+        with self._lock:
+            timers = sorted(self.timers.items(), key=lambda kv: -sum(kv[1].samples))
+            for stage, h in timers:
+                lines.append(f"{stage:<22}{len(h.samples):>7}{sum(h.samples):>10.2f}"
+                             f"{h.percentile(50) * 1000:>10.1f}{h.percentile(95) * 1000:>10.1f}")
+        return "\n".join(lines)
+
+
+_current: Metrics | None = None
+
+
+def current() -> Metrics | None:
+    return _current
+
+
+@contextmanager
+def timer(stage: str) -> Iterator[None]:
+    """Time a stage of the current run (a no-op outside a run)."""
+    if _current is None:
+        yield
+        return
+    with _current.timer(stage):
+        yield
+
+
+def record(stage: str, seconds: float) -> None:
+    if _current is not None:
+        _current.record(stage, seconds)
+
+
+def observe(name: str, value: float) -> None:
+    if _current is not None:
+        _current.observe(name, value)
+
+
+def count(name: str, amount: float = 1) -> None:
+    if _current is not None:
+        _current.count(name, amount)
+
+
+def count_all(prefix: str, stats: dict) -> None:
+    if _current is not None:
+        _current.count_all(prefix, stats)
+
+
+def profile_summary(profiler: cProfile.Profile, top: int = PROFILE_TOP) -> list[dict]:
+    """The `top` functions by cumulative time, as JSON-friendly rows."""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({"function": f"{Path(filename).name}:{line}({function})", "calls": calls,
+                     "tottime": round(tottime, 6), "cumtime": round(cumtime, 6)})
+    rows.sort(key=lambda row: -row["cumtime"])
+    return rows[:top]
+
+
+@contextmanager
+def run(script: str, profile: bool = False, directory: Path | None = None) -> Iterator[Metrics]:
+    """Collect metrics for the enclosed run of `script` and write them when it ends.
+
+    Runs nest: the previous run (if any) is current again afterwards, so a script's
+    main() can be called repeatedly in one process (bench_extract.py). directory
+    defaults to METRICS_DIR as it is when the run starts, so a caller can redirect
+    a script's metrics by setting metrics.METRICS_DIR.
+    """
+    global _current
+    if directory is None:
+        directory = METRICS_DIR
+    metrics = Metrics(script)
+    previous, _current = _current, metrics
+    profiler = cProfile.Profile() if profile or os.environ.get(PROFILE_ENV) == "1" else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield metrics
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        metrics.finish()
+        _current = previous
+        if profiler is not None:
+            metrics.profile = profile_summary(profiler)
+        path = metrics.write(directory)   # creates the directory, so the .prof goes after it
+        if profiler is not None:
+            profiler.dump_stats(str(path.with_suffix(".prof")))
+        if metrics.timers:
+            print(f"\n{metrics.report()}")
+        print(f"Metrics written to {path}")
+
+
+def compare(old: dict, new: dict) -> str:
+    """Side-by-side totals of two runs' metrics (as written by Metrics.write)."""
+
+    def change(before: float, after: float) -> str:
+        return f"{(after - before) / before:+.0%}" if before else ""
+
+    lines = [f"{old['script']}: {old['started_at']} → {new['started_at']}",
+             f"{'elapsed':<34}{old['elapsed']:>12.2f}{new['elapsed']:>12.2f}{change(old['elapsed'], new['elapsed']):>8}"]
+    for section, field in (("timers", "total"), ("timers", "p95"), ("histograms", "p95")):
+        names = sorted(old[section].keys() | new[section].keys())
+        for name in names:
+            before = old[section].get(name, {}).get(field, 0.0)
+            after = new[section].get(name, {}).get(field, 0.0)
+            lines.append(f"{f'{name} ({field})':<34}{before:>12.3f}{after:>12.3f}{change(before, after):>8}")
+    for name in sorted(old["counters"].keys() | new["counters"].keys()):
+        before, after = old["counters"].get(name, 0), new["counters"].get(name, 0)
+        lines.append(f"{name:<34}{before:>12g}{after:>12g}{change(before, after):>8}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the last two metrics files of a script.")
+    parser.add_argument("script", help="Script name, e.g. extract_recs")
+    parser.add_argument("--dir", type=Path, default=METRICS_DIR, help=f"Metrics directory (default: {METRICS_DIR})")
+    args = parser.parse_args()
+
+    runs = sorted(args.dir.glob(f"{args.script}-*.json"))
+    if len(runs) < 2:
+        print(f"Need two runs of {args.script} in {args.dir}/, found {len(runs)}")
+        sys.exit(1)
+    with open(runs[-2], encoding="utf-8") as f:
+        old = json.load(f)
+    with open(runs[-1], encoding="utf-8") as f:
+        new = json.load(f)
+    print(compare(old, new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Incremental build pipeline: transcripts → recommendations.json → web/public.
+
+Runs the scripts as a DAG, in parallel wherever stages don't depend on each other:
+
+    index     (transcript_index.py update) ──────┐
+    sections  (extract_recs.py --sections-only) ─┴─► extract (extract_recs.py) ──┐
+    feed      (revalidate the podcast RSS feed) ────────────────────────────────┴─► substack (add_substack_urls.py)
+              ──► items (add_item_urls.py) ──► dedupe (dedupe_items.py canonical ids)
+              ──► mentions (link_timestamps.py) ──► publish (copy to web/public/)
+
+.pipeline_state.json remembers, per stage and per episode, a hash of the inputs the
+episode was last built from:
+
+- extract:  the episode's transcript sections + the prompt and models in extract_recs.py
+- substack: guest names
+- items:    Substack URL + names of the recommended items
+
+Each run hands a stage only the episodes whose inputs changed (plus new ones) and
+skips the stage outright when there are none, so adding one transcript costs one
+LLM call, one feed revalidation and one page fetch. A changed episode is reset in
+recommendations.json before its stage runs, so downstream stages redo it too.
+
+Run: python3 pipeline.py [--concurrency 4] [--offline] [--skip STAGE ...]
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from add_item_urls import share_cluster_urls
+from add_substack_urls import fetch_podcast_feed
+from dedupe_items import assign_canonical_ids
+from link_timestamps import link_all
+from transcript_index import update_index
+from transcripts import file_signature, load_turns
+
+RECS_FILE = Path("recommendations.json")
+PUBLISH_FILE = Path("web/public/recommendations.json")
+STATE_FILE = Path(".pipeline_state.json")
+SECTIONS_CACHE_FILE = Path(".sections_cache.json")
+EXTRACT_SCRIPT = Path("extract_recs.py")
+# Constants in extract_recs.py that change what the LLM is asked
+PROMPT_CONSTANTS = ("PROMPT_VERSION", "GROQ_MODEL", "GEMINI_MODEL", "EXTRACTION_PROMPT")
+
+# Stage name -> stages it depends on
+STAGES = {
+    "index": [],
+    "sections": [],
+    "feed": [],
+    "extract": ["index", "sections"],
+    "substack": ["extract", "feed"],
+    "items": ["substack"],
+    "dedupe": ["items"],
+    "mentions": ["dedupe"],
+    "publish": ["mentions"],
+}
+
+
+def digest(*parts) -> str:
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def prompt_fingerprint() -> str:
+    """Hash the prompt/model constants of extract_recs.py, read without importing it (and its SDKs)."""
+    tree = ast.parse(EXTRACT_SCRIPT.read_text(encoding="utf-8"))
+    values = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            if name in PROMPT_CONSTANTS:
+                values[name] = ast.literal_eval(node.value)
+    return digest(values)
+
+
+def item_names(episode: dict) -> list:
+    lr = episode.get("lightning_round") or {}
+    return [
+        [b.get("title"), b.get("author")] for b in lr.get("books") or []
+    ] + [
+        m.get("title") for m in lr.get("tv_movies") or []
+    ] + [
+        p.get("name") for p in lr.get("products") or []
+    ]
+
+
+def load_json(path: Path, default):
+    if not path.exists():
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json(path: Path, data, **dump_args) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, **dump_args)
+    os.replace(tmp, path)
+
+
+def run_script(*argv: str) -> None:
+    print(f"$ python3 {' '.join(argv[:6])}{' ...' if len(argv) > 6 else ''}", flush=True)
+    subprocess.run([sys.executable, *argv], check=True)
+
+
+def run_dag(stages: dict, dependencies: dict, skip: set) -> dict:
+    """Run stage callables as soon as their dependencies finish, several at a time.
+
+    A stage returns True if it did work and False if it was up to date. Returns
+    {stage: "done" | "up to date" | "skipped" | "failed" | "blocked"}; dependents of a
+    failed stage are blocked.
+    """
+    status = {name: "skipped" for name in skip}
+    running = {}
+    with ThreadPoolExecutor(max_workers=len(stages)) as pool:
+        while len(status) < len(stages):
+            for name, fn in stages.items():
+                if name in status or name in running:
+                    continue
+                deps = [status.get(dep) for dep in dependencies[name]]
+                if any(s in ("failed", "blocked") for s in deps):
+                    status[name] = "blocked"
+                elif all(s in ("done", "up to date", "skipped") for s in deps):
+                    running[name] = pool.submit(fn)
+            if not running:
+                continue
+
+            finished, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+            for name, future in list(running.items()):
+                if future not in finished:
+                    continue
+                del running[name]
+                try:
+                    status[name] = "done" if future.result() else "up to date"
+                except Exception as e:
+                    print(f"✗ {name} failed: {e}", flush=True)
+                    status[name] = "failed"
+    return status
+
+
+class Pipeline:
+    def __init__(self, args):
+        self.args = args
+        self.state = load_json(STATE_FILE, {})
+        self.feed_hash = None
+        self._lock = threading.Lock()
+
+    def save_state(self) -> None:
+        with self._lock:
+            write_json(STATE_FILE, self.state, indent=2)
+
+    def stages(self) -> dict:
+        return {
+            "index": self.index,
+            "sections": self.sections,
+            "feed": self.feed,
+            "extract": self.extract,
+            "substack": self.substack,
+            "items": self.items,
+            "dedupe": self.dedupe,
+            "mentions": self.mentions,
+            "publish": self.publish,
+        }
+
+    # ── Stages ──
+
+    def index(self) -> bool:
+        # extract_recs.py checks extracted items against the index
+        indexed, removed = update_index()
+        if not indexed and not removed:
+            print("index: up to date", flush=True)
+            return False
+        print(f"index: {indexed} transcripts indexed, {removed} removed", flush=True)
+        return True
+
+    def sections(self) -> bool:
+        # Cheap when nothing changed: the sections cache is keyed by mtime and size, and
+        # extract_recs.py only rewrites it when some transcript's sections were rebuilt
+        before = file_signature(SECTIONS_CACHE_FILE) if SECTIONS_CACHE_FILE.exists() else None
+        run_script(str(EXTRACT_SCRIPT), "--sections-only")
+        after = file_signature(SECTIONS_CACHE_FILE) if SECTIONS_CACHE_FILE.exists() else None
+        if after == before:
+            print("sections: up to date", flush=True)
+            return False
+        print(f"sections: {SECTIONS_CACHE_FILE} updated", flush=True)
+        return True
+
+    def feed(self) -> bool:
+        if self.args.offline:
+            return False
+        self.feed_hash = hashlib.sha256(fetch_podcast_feed()).hexdigest()[:16]
+        changed = self.feed_hash != self.state.get("feed")
+        print(f"feed: {'changed' if changed else 'unchanged'}", flush=True)
+        return changed
+
+    def extract(self) -> bool:
+        fingerprint = prompt_fingerprint()
+        sections_cache = load_json(SECTIONS_CACHE_FILE, {}).get("files", {})
+        current = {
+            Path(path).name: digest(fingerprint, entry["sections"]["intro"],
+                                    entry["sections"]["lightning_round"], entry["sections"]["outro"])
+            for path, entry in sections_cache.items() if entry["sections"] is not None
+        }
+        done = {r["filename"] for r in load_json(RECS_FILE, [])}
+        if "extract" not in self.state:
+            # First pipeline run: trust what's already in recommendations.json
+            self.state["extract"] = {name: current[name] for name in done if name in current}
+        built = self.state["extract"]
+
+        redo = sorted(name for name in done if name in current and built.get(name) != current[name])
+        new = sorted(name for name in current if name not in done)
+        if not redo and not new:
+            print("extract: up to date", flush=True)
+            return False
+
+        print(f"extract: {len(new)} new, {len(redo)} changed", flush=True)
+        argv = [str(EXTRACT_SCRIPT), "--concurrency", str(self.args.concurrency)]
+        if redo:
+            argv += ["--redo", *redo]
+        run_script(*argv)
+
+        self.state["extract"] = {r["filename"]: current[r["filename"]]
+                                 for r in load_json(RECS_FILE, []) if r["filename"] in current}
+        self.save_state()
+        return True
+
+    def substack(self) -> bool:
+        recs = load_json(RECS_FILE, [])
+        current = {ep["filename"]: digest([g.get("name") for g in ep.get("guests") or []]) for ep in recs}
+        if "substack" not in self.state:
+            self.state["substack"] = {ep["filename"]: current[ep["filename"]] for ep in recs if "substack_url" in ep}
+        built = self.state["substack"]
+
+        changed = [ep for ep in recs if "substack_url" in ep and built.get(ep["filename"]) != current[ep["filename"]]]
+        missing = [ep for ep in recs if "substack_url" not in ep]
+        new_feed = (self.feed_hash is not None and self.feed_hash != self.state.get("feed")
+                    and any(ep.get("substack_url") is None for ep in recs))
+        if not changed and not missing and not new_feed:
+            print("substack: up to date", flush=True)
+            return False
+
+        print(f"substack: {len(missing)} new, {len(changed)} with changed guests"
+              f"{', new feed items' if new_feed else ''}", flush=True)
+        if changed:
+            for ep in changed:
+                del ep["substack_url"]   # rematched against the whole feed
+            write_json(RECS_FILE, recs, indent=2)
+        # The feed stage has already revalidated the cached feed
+        run_script("add_substack_urls.py", "--offline")
+
+        recs = load_json(RECS_FILE, [])
+        self.state["substack"] = {ep["filename"]: current.get(ep["filename"]) for ep in recs if "substack_url" in ep}
+        if self.feed_hash is not None:
+            self.state["feed"] = self.feed_hash
+        self.save_state()
+        return True
+
+    def items(self) -> bool:
+        recs = load_json(RECS_FILE, [])
+        current = {ep["filename"]: digest(ep.get("substack_url"), item_names(ep)) for ep in recs}
+        if "items" not in self.state:
+            self.state["items"] = {ep["filename"]: current[ep["filename"]] for ep in recs if "where_to_find" in ep}
+        built = self.state["items"]
+
+        affected = [ep for ep in recs
+                    if "where_to_find" not in ep or built.get(ep["filename"]) != current[ep["filename"]]]
+        if not affected:
+            print("items: up to date", flush=True)
+            return False
+
+        print(f"items: {len(affected)} episodes", flush=True)
+        for ep in affected:
+            # Clear earlier results so the page is scraped and matched afresh
+            lr = ep.get("lightning_round") or {}
+            for item in (lr.get("books") or []) + (lr.get("tv_movies") or []) + (lr.get("products") or []):
+                item.pop("url", None)
+            ep.pop("where_to_find", None)
+        write_json(RECS_FILE, recs, indent=2)
+
+        argv = ["add_item_urls.py", "--concurrency", str(self.args.concurrency),
+                "--only", *[ep["filename"] for ep in affected]]
+        if self.args.offline:
+            argv.append("--offline")
+        run_script(*argv)
+
+        # Episodes whose page couldn't be fetched have no where_to_find and are retried next run
+        for ep in load_json(RECS_FILE, []):
+            if "where_to_find" in ep and ep["filename"] in current:
+                built[ep["filename"]] = current[ep["filename"]]
+        self.save_state()
+        return True
+
+    def dedupe(self) -> bool:
+        # Clustering every item takes well under a second, so it's simply redone
+        recs = load_json(RECS_FILE, [])
+        stats = assign_canonical_ids(recs)
+        changed = sum(s["changed"] for s in stats.values())
+        shared = share_cluster_urls(recs)
+        if not changed and not shared:
+            print("dedupe: up to date", flush=True)
+            return False
+        write_json(RECS_FILE, recs, indent=2)
+        print(f"dedupe: {changed} canonical ids changed, {shared} URLs shared within clusters", flush=True)
+        return True
+
+    def mentions(self) -> bool:
+        # One automaton scan per lightning round: cheap enough to redo every run
+        recs = load_json(RECS_FILE, [])
+        before = json.dumps(recs, sort_keys=True)
+        with load_turns() as store:
+            found, total = link_all(recs, store)
+        if json.dumps(recs, sort_keys=True) == before:
+            print("mentions: up to date", flush=True)
+            return False
+        write_json(RECS_FILE, recs, indent=2)
+        print(f"mentions: {found}/{total} items linked to a transcript timestamp", flush=True)
+        return True
+
+    def publish(self) -> bool:
+        data = RECS_FILE.read_bytes()
+        if PUBLISH_FILE.exists() and PUBLISH_FILE.read_bytes() == data:
+            print("publish: up to date", flush=True)
+            return False
+        tmp = PUBLISH_FILE.with_suffix(".json.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, PUBLISH_FILE)
+        print(f"publish: copied {RECS_FILE} to {PUBLISH_FILE}", flush=True)
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally rebuild recommendations.json and publish it.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel LLM requests / page fetches")
+    parser.add_argument("--offline", action="store_true", help="Use cached feed and pages only")
+    parser.add_argument("--skip", nargs="+", default=[], choices=list(STAGES), metavar="STAGE",
+                        help=f"Treat these stages as up to date ({', '.join(STAGES)})")
+    args = parser.parse_args()
+
+    pipeline = Pipeline(args)
+    status = run_dag(pipeline.stages(), STAGES, set(args.skip))
+
+    print(f"\n{'─'*50}")
+    for name in STAGES:
+        print(f"{name:<10} {status[name]}")
+    if any(s in ("failed", "blocked") for s in status.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("groq")
+pytest.importorskip("google.genai")
+
+import extract_recs  # noqa: E402
+
+TRANSCRIPTS_DIR = Path(__file__).resolve().parent.parent / extract_recs.TRANSCRIPTS_DIR
+
+
+def long_section(turns: int, words: int) -> str:
+    return "\n\n".join(
+        f"{'LENNY RACHITSKY' if n % 2 else 'KUNAL SHAH'} (00:{n // 60 % 60:02d}:{n % 60:02d}):\n"
+        + " ".join(f"word{n}x{i}" for i in range(words))
+        for n in range(turns)
+    )
+
+
+@pytest.mark.parametrize("turns, words", [(400, 60), (3, 20000)])
+def test_fitted_prompt_stays_within_request_budget(turns, words):
+    sections = {name: long_section(turns, words) for name in ("intro", "lightning_round", "outro")}
+    fitted = extract_recs.fit_sections(sections)
+    budget = min(extract_recs.REQUEST_TOKEN_BUDGET.values())
+    assert extract_recs.estimate_tokens(extract_recs.build_prompt(fitted)) <= budget
+
+
+def test_transcript_closest_to_budget_fits():
+    # The one furthest over before section headers were counted in the budget
+    sections = extract_recs.extract_sections(TRANSCRIPTS_DIR / "Kunal Shah.txt")
+    budget = min(extract_recs.REQUEST_TOKEN_BUDGET.values())
+    assert extract_recs.estimate_tokens(extract_recs.build_prompt(sections)) <= budget
@@ -0,0 +1,16 @@
+import json
+
+import metrics
+
+
+def test_profiled_run_creates_metrics_directory(tmp_path):
+    directory = tmp_path / "metrics"
+    with metrics.run("demo", profile=True, directory=directory):
+        with metrics.timer("stage"):
+            sum(range(1000))
+
+    [written] = directory.glob("demo-*.json")
+    assert written.with_suffix(".prof").exists()
+    data = json.loads(written.read_text(encoding="utf-8"))
+    assert data["timers"]["stage"]["count"] == 1
+    assert data["profile"]
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Positional full-text index over the transcripts, for phrase and prefix search.
+
+Words are lowercase ASCII alphanumeric runs. For every word and transcript the index
+stores the word's positions in that transcript, so a phrase is found by checking
+that its words sit at consecutive positions, and a trailing * matches every word
+with that prefix. Each hit maps back to its speaker turn (speaker, timestamp) and
+its byte offset in the file, found by re-reading the words of just that turn.
+
+The index lives in .transcript_index.sqlite:
+
+    files     one row per transcript: name, content hash, mtime/size signature
+    turns     speaker turns: first word position, speaker, timestamp, byte offset
+    postings  (word, file) -> word positions, as packed uint16 arrays (uint32 for
+              transcripts of 65536 words or more)
+
+Updates are incremental: a transcript is re-indexed only when its content hash
+changes (mtime and size are checked first, so unchanged files aren't even hashed),
+and transcripts that were deleted are dropped.
+
+Usage:
+    python3 transcript_index.py update
+    python3 transcript_index.py query "high output management"
+    python3 transcript_index.py query "notio*" --files
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import re
+import sqlite3
+import sys
+import time
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+from transcripts import TRANSCRIPTS_DIR, file_signature, iter_turns, open_transcript
+
+INDEX_FILE = Path(".transcript_index.sqlite")
+INDEX_VERSION = 1  # bump when tokenization or the schema changes to force a rebuild
+TOKEN_RE = re.compile(rb"[a-z0-9]+")
+SNIPPET_BYTES = 80
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    hash TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    typecode TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    file_id INTEGER NOT NULL,
+    turn INTEGER NOT NULL,
+    first_token INTEGER NOT NULL,
+    speaker TEXT NOT NULL,
+    timestamp TEXT,
+    offset INTEGER NOT NULL,
+    PRIMARY KEY (file_id, turn)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    file_id INTEGER NOT NULL,
+    positions BLOB NOT NULL,
+    PRIMARY KEY (term, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_by_file ON postings (file_id);
+"""
+
+
+class Hit(NamedTuple):
+    filename: str
+    position: int          # word position of the first word of the match
+    offset: int            # byte offset of the match in the transcript
+    turn: int              # speaker turn number, or -1 before the first header
+    speaker: str | None
+    timestamp: str | None  # "hh:mm:ss" of the turn
+
+
+def tokenize(buf) -> tuple[list[bytes], list[int]]:
+    """Return the transcript's words and each word's byte offset."""
+    words, offsets = [], []
+    for m in TOKEN_RE.finditer(bytes(buf).lower()):
+        words.append(m.group())
+        offsets.append(m.start())
+    return words, offsets
+
+
+def parse_query(query: str) -> list[tuple[str, bool]]:
+    """Split a query into (word, is_prefix) terms; "foo*" is a prefix term."""
+    terms = []
+    for m in re.finditer(r"([a-z0-9]+)(\*?)", query.lower()):
+        terms.append((m.group(1), bool(m.group(2))))
+    return terms
+
+
+def content_hash(filepath: Path) -> str:
+    return hashlib.sha256(filepath.read_bytes()).hexdigest()[:16]
+
+
+def signature_text(filepath: Path) -> str:
+    """file_signature() as stored in the files table, "<mtime_ns>:<size>"."""
+    return ":".join(map(str, file_signature(filepath)))
+
+
+def analyze(filepath: Path) -> tuple[str, dict]:
+    """Tokenize one transcript into postings and turns (module-level for the process pool)."""
+    with open_transcript(filepath) as buf:
+        words, offsets = tokenize(buf)
+        headers = list(iter_turns(buf))
+
+    typecode = "H" if len(words) <= 0xFFFF else "I"
+    postings: dict[bytes, array] = {}
+    for position, word in enumerate(words):
+        positions = postings.get(word)
+        if positions is None:
+            positions = postings[word] = array(typecode)
+        positions.append(position)
+
+    # A turn starts at the first word of its header line
+    turns = []
+    for n, (offset, speaker, timestamp) in enumerate(headers):
+        turns.append((n, bisect_right(offsets, offset - 1), speaker, timestamp, offset))
+
+    return filepath.name, {
+        "hash": content_hash(filepath),
+        "signature": signature_text(filepath),
+        "typecode": typecode,
+        "turns": turns,
+        "postings": {word.decode("ascii"): positions.tobytes() for word, positions in postings.items()},
+    }
+
+
+class TranscriptIndex:
+    def __init__(self, path: Path = INDEX_FILE, directory: Path = TRANSCRIPTS_DIR):
+        self.path = path
+        self.directory = directory
+        self.db = sqlite3.connect(path)
+        # A lost index is rebuilt from the transcripts, so trade durability for write speed
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = OFF")
+        self.db.executescript(SCHEMA)
+        version = self.db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if version is None or int(version[0]) != INDEX_VERSION:
+            with self.db:
+                self.db.execute("DELETE FROM files")
+                self.db.execute("DELETE FROM turns")
+                self.db.execute("DELETE FROM postings")
+                self.db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(INDEX_VERSION),))
+        self._files: dict[int, tuple[str, str]] | None = None
+        self._turns: dict[int, tuple[list[int], list[tuple]]] = {}
+
+    def close(self) -> None:
+        self.db.close()
+
+    # ── Updating ──
+
+    def update(self, files: list[Path]) -> tuple[int, int]:
+        """Re-index new and changed transcripts, drop deleted ones; returns (indexed, removed)."""
+        known = {name: (file_id, digest, signature)
+                 for file_id, name, digest, signature in self.db.execute("SELECT id, name, hash, signature FROM files")}
+
+        stale = []
+        for filepath in files:
+            entry = known.get(filepath.name)
+            signature = signature_text(filepath)
+            if entry is None:
+                stale.append(filepath)
+            elif entry[2] != signature:
+                if entry[1] == content_hash(filepath):
+                    # Touched but unchanged: just remember the new mtime
+                    with self.db:
+                        self.db.execute("UPDATE files SET signature = ? WHERE id = ?", (signature, entry[0]))
+                else:
+                    stale.append(filepath)
+
+        current = {filepath.name for filepath in files}
+        removed = [file_id for name, (file_id, _, _) in known.items() if name not in current]
+        with self.db:
+            for file_id in removed:
+                self._delete(file_id)
+
+        if stale:
+            with ProcessPoolExecutor() as pool:
+                for name, data in pool.map(analyze, stale, chunksize=4):
+                    self._store(name, data, known.get(name, (None,))[0])
+
+        self._files = None
+        self._turns.clear()
+        return len(stale), len(removed)
+
+    def _delete(self, file_id: int) -> None:
+        for table, column in (("files", "id"), ("turns", "file_id"), ("postings", "file_id")):
+            self.db.execute(f"DELETE FROM {table} WHERE {column} = ?", (file_id,))
+
+    def _store(self, name: str, data: dict, file_id: int | None) -> None:
+        # One transaction per transcript, so an interrupted update loses at most one
+        with self.db:
+            if file_id is not None:
+                self._delete(file_id)
+            file_id = self.db.execute(
+                "INSERT INTO files (name, hash, signature, typecode) VALUES (?, ?, ?, ?)",
+                (name, data["hash"], data["signature"], data["typecode"]),
+            ).lastrowid
+            self.db.executemany("INSERT INTO turns VALUES (?, ?, ?, ?, ?, ?)",
+                                [(file_id, *turn) for turn in data["turns"]])
+            self.db.executemany("INSERT INTO postings VALUES (?, ?, ?)",
+                                [(term, file_id, blob) for term, blob in sorted(data["postings"].items())])
+
+    # ── Querying ──
+
+    def _term_postings(self, term: str, prefix: bool, file_id: int | None = None) -> dict[int, set[int]]:
+        """{file id: positions} for one query term, optionally in one transcript only."""
+        # Every word in [term, term + highest char) starts with term
+        sql, params = ("term >= ? AND term < ?", [term, term + "\x7f"]) if prefix else ("term = ?", [term])
+        if file_id is not None:
+            sql, params = sql + " AND file_id = ?", params + [file_id]
+        rows = self.db.execute(f"SELECT file_id, positions FROM postings WHERE {sql}", params)
+        found: dict[int, set[int]] = {}
+        for file_id, blob in rows:
+            positions = array(self._file(file_id)[1])
+            positions.frombytes(blob)
+            found.setdefault(file_id, set()).update(positions)
+        return found
+
+    def _file(self, file_id: int) -> tuple[str, str]:
+        """(name, postings typecode) of a transcript."""
+        if self._files is None:
+            self._files = {file_id: (name, typecode)
+                           for file_id, name, typecode in self.db.execute("SELECT id, name, typecode FROM files")}
+        return self._files[file_id]
+
+    def _turn_at(self, file_id: int, position: int) -> tuple[int, int, int, str | None, str | None]:
+        """(turn, first word position, byte offset, speaker, timestamp) of the turn holding a word."""
+        if file_id not in self._turns:
+            rows = self.db.execute(
+                "SELECT first_token, turn, offset, speaker, timestamp FROM turns WHERE file_id = ? ORDER BY turn",
+                (file_id,)).fetchall()
+            self._turns[file_id] = ([row[0] for row in rows], rows)
+        starts, turns = self._turns[file_id]
+        i = bisect_right(starts, position) - 1
+        if i < 0:
+            return -1, 0, 0, None, None
+        first_token, turn, offset, speaker, timestamp = turns[i]
+        return turn, first_token, offset, speaker, timestamp
+
+    def _offset(self, buf, position: int, first_token: int, turn_offset: int) -> int:
+        """Byte offset of a word, counting words from the start of its turn."""
+        words = TOKEN_RE.finditer(bytes(buf[turn_offset:]).lower())
+        for _ in range(position - first_token):
+            next(words)
+        return turn_offset + next(words).start()
+
+    def match_positions(self, query: str, filename: str | None = None) -> dict[int, list[int]]:
+        """{file id: sorted word positions where the query (a phrase) starts}."""
+        terms = parse_query(query)
+        file_id = None
+        if filename is not None:
+            row = self.db.execute("SELECT id FROM files WHERE name = ?", (filename,)).fetchone()
+            if row is None:
+                return {}
+            file_id = row[0]
+        if not terms:
+            return {}
+        postings = [self._term_postings(term, prefix, file_id) for term, prefix in terms]
+        # Intersect the terms found in fewest files first, so the candidates shrink fastest
+        files = set(postings[0])
+        for found in sorted(postings[1:], key=len):
+            files &= found.keys()
+
+        matches = {}
+        for file_id in files:
+            starts = [p for p in postings[0][file_id]
+                      if all(p + k in postings[k][file_id] for k in range(1, len(terms)))]
+            if starts:
+                matches[file_id] = sorted(starts)
+        return matches
+
+    def search(self, query: str, limit: int | None = None) -> list[Hit]:
+        """Every occurrence of the query, ordered by transcript then position."""
+        hits = []
+        for file_id, positions in sorted(self.match_positions(query).items(),
+                                         key=lambda item: self._file(item[0])[0]):
+            name = self._file(file_id)[0]
+            with open_transcript(self.directory / name) as buf:
+                for position in positions:
+                    if limit is not None and len(hits) >= limit:
+                        return hits
+                    turn, first_token, turn_offset, speaker, timestamp = self._turn_at(file_id, position)
+                    offset = self._offset(buf, position, first_token, turn_offset)
+                    hits.append(Hit(name, position, offset, turn, speaker, timestamp))
+        return hits
+
+    def count(self, query: str, filename: str | None = None) -> dict[str, int]:
+        """{transcript filename: number of occurrences of the query}, optionally for one transcript."""
+        return {self._file(file_id)[0]: len(positions)
+                for file_id, positions in self.match_positions(query, filename).items()}
+
+
+def snippet(hit: Hit, directory: Path = TRANSCRIPTS_DIR) -> str:
+    with open_transcript(directory / hit.filename) as buf:
+        start = max(0, hit.offset - SNIPPET_BYTES)
+        text = bytes(buf[start:hit.offset + SNIPPET_BYTES]).decode("utf-8", errors="ignore")
+    return " ".join(text.split())
+
+
+def update_index(directory: Path = TRANSCRIPTS_DIR, path: Path = INDEX_FILE) -> tuple[int, int]:
+    index = TranscriptIndex(path, directory)
+    try:
+        return index.update(sorted(directory.glob("*.txt")))
+    finally:
+        index.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text index over the podcast transcripts.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("update", help="Index new and changed transcripts")
+    query = commands.add_parser("query", help="Find a phrase; end a word with * to match a prefix")
+    query.add_argument("text")
+    query.add_argument("--limit", type=int, default=20, help="Max hits to show (default: 20)")
+    query.add_argument("--files", action="store_true", help="Only list matching transcripts with counts")
+    args = parser.parse_args()
+
+    if args.command == "update":
+        if not TRANSCRIPTS_DIR.exists():
+            print(f"Error: directory '{TRANSCRIPTS_DIR}' not found.")
+            sys.exit(1)
+        start = time.perf_counter()
+        indexed, removed = update_index()
+        print(f"Indexed {indexed} transcripts, removed {removed} in {time.perf_counter() - start:.2f}s "
+              f"({INDEX_FILE}, {INDEX_FILE.stat().st_size / 1024 / 1024:.1f} MB)")
+        return
+
+    if not INDEX_FILE.exists():
+        print(f"Error: no index yet; run: python3 {Path(__file__).name} update")
+        sys.exit(1)
+    index = TranscriptIndex()
+    start = time.perf_counter()
+    if args.files:
+        counts = index.count(args.text)
+        elapsed = time.perf_counter() - start
+        for filename, n in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+            print(f"{n:5}  {filename}")
+        print(f"\n{sum(counts.values())} matches in {len(counts)} transcripts ({elapsed * 1000:.1f} ms)")
+    else:
+        hits = index.search(args.text, limit=args.limit)
+        elapsed = time.perf_counter() - start
+        for hit in hits:
+            print(f"{hit.filename} [{hit.timestamp or '--:--:--'}] {hit.speaker or '?'}: …{snippet(hit)}…")
+        print(f"\n{len(hits)} hits shown ({elapsed * 1000:.1f} ms)")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -32,6 +32,41 @@ describe('schemas', () => {
       const result = EpisodeSchema.safeParse(invalid);
       expect(result.success).toBe(false);
     });
+
+    it('should keep canonical ids on items', () => {
+      const episode = {
+        ...mockEpisode,
+        lightning_round: {
+          books: [{ title: 'Dune', canonical_id: 'dune' }],
+          tv_movies: [{ title: 'Severance', type: 'tv', canonical_id: null }],
+          products: [{ name: 'Notion', canonical_id: 'notion' }],
+        },
+      };
+      const result = EpisodeSchema.safeParse(episode);
+      expect(result.success).toBe(true);
+      if (!result.success) return;
+      expect(result.data.lightning_round.books[0].canonical_id).toBe('dune');
+      expect(result.data.lightning_round.tv_movies[0].canonical_id).toBeNull();
+      expect(result.data.lightning_round.products[0].canonical_id).toBe('notion');
+    });
+
+    it('should keep lightning-round mentions on items', () => {
+      const mention = { timestamp: '01:11:42', speaker: 'Ada Chen Rekhi' };
+      const episode = {
+        ...mockEpisode,
+        lightning_round: {
+          books: [{ title: 'Dune', mention }],
+          tv_movies: [{ title: 'Severance', type: 'tv', mention: null }],
+          products: [{ name: 'Notion', mention: { timestamp: null, speaker: 'Ada Chen Rekhi' } }],
+        },
+      };
+      const result = EpisodeSchema.safeParse(episode);
+      expect(result.success).toBe(true);
+      if (!result.success) return;
+      expect(result.data.lightning_round.books[0].mention).toEqual(mention);
+      expect(result.data.lightning_round.tv_movies[0].mention).toBeNull();
+      expect(result.data.lightning_round.products[0].mention?.timestamp).toBeNull();
+    });
   });
 
   describe('EpisodesArraySchema', () => {
@@ -15,11 +15,18 @@ export const GuestSchema = z.object({
   }),
 });
 
+export const MentionSchema = z.object({
+  timestamp: z.string().nullable(),
+  speaker: z.string(),
+});
+
 export const BookSchema = z.object({
   title: z.string(),
   author: z.string().nullable().optional(),
   why: z.string().nullable().optional(),
   url: z.string().nullable().optional(),
+  canonical_id: z.string().nullable().optional(),
+  mention: MentionSchema.nullable().optional(),
 });
 
 export const TvMovieSchema = z.object({
@@ -27,12 +34,16 @@ export const TvMovieSchema = z.object({
   type: z.string().optional().default('movie'),
   why: z.string().nullable().optional(),
   url: z.string().nullable().optional(),
+  canonical_id: z.string().nullable().optional(),
+  mention: MentionSchema.nullable().optional(),
 });
 
 export const ProductSchema = z.object({
   name: z.string(),
   why: z.string().nullable().optional(),
   url: z.string().nullable().optional(),
+  canonical_id: z.string().nullable().optional(),
+  mention: MentionSchema.nullable().optional(),
 });
 
 export const LightningRoundSchema = z.object({
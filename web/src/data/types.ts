@@ -8,11 +8,18 @@ export interface Guest {
   };
 }
 
+export interface Mention {
+  timestamp: string | null;
+  speaker: string;
+}
+
 export interface Book {
   title: string;
   author?: string | null;
   why?: string | null;
   url?: string | null;
+  canonical_id?: string | null;
+  mention?: Mention | null;
 }
 
 export interface TvMovie {
@@ -20,12 +27,16 @@ export interface TvMovie {
   type?: 'tv_show' | 'movie' | string;
   why?: string | null;
   url?: string | null;
+  canonical_id?: string | null;
+  mention?: Mention | null;
 }
 
 export interface Product {
   name: string;
   why?: string | null;
   url?: string | null;
+  canonical_id?: string | null;
+  mention?: Mention | null;
 }
 
 export interface LightningRound {